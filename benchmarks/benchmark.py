@@ -0,0 +1,303 @@
+"""
+Benchmark of the ``sphinx_ros`` extension on synthetic projects.
+
+A project with N packages, each with M messages of K fields and S services,
+is generated with the ``ros:package``, ``ros:message``, and ``ros:service``
+directives. Field types reference primitives, messages in the same package,
+and messages in other packages, so that every build resolves many
+cross-references. Optionally, the packages describe P nodes of the
+computation graph with the ``ros:node`` directive, each publishing and
+subscribing to topics out of T topics, which the topic index lists.
+
+For every project size, a full build is timed, followed by an incremental
+build after touching a single document. Each build runs in a separate
+process so that the peak memory is measured per build. The results are
+written as JSON, to compare them between releases::
+
+    python benchmarks/benchmark.py --packages 10 50 100 --messages 20 \\
+        --fields 8 --output results.json
+    python benchmarks/benchmark.py --packages 100 --nodes 600 --topics 3000
+
+The measured phases are:
+
+* ``read``: reading all outdated documents, from ``env-before-read-docs``
+  to ``env-updated``
+* ``resolve_xref``: the time spent resolving ROS cross-references, in
+  ``RosReferencesResolver`` and ``RosDomain.resolve_xref``, and the number
+  of calls of the latter, which only sees the references left unresolved
+* ``index``: the time spent generating the package, message, and topic
+  indices
+* ``write``: everything after reading, i.e. pickling, resolving and writing
+* ``total``: the whole build, including the setup of the application
+* ``peak_memory_kb``: the peak resident memory of the build process
+* ``env_pickle_bytes``: the size of the pickled environment, and
+  ``env_pickle_load`` the time to load it, which every incremental build pays
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONF_PY = '''\
+import sys
+sys.path.insert(0, {root!r})
+extensions = ['sphinx_ros']
+master_doc = 'index'
+project = 'sphinx_ros benchmark'
+'''
+
+PRIMITIVES = ['bool', 'int32', 'float64', 'string', 'uint8[]', 'time']
+
+#: number of topics each node publishes and subscribes to
+TOPICS_PER_NODE = 5
+
+
+def package_rst(pkg, n_packages, n_messages, n_fields, n_services,
+                nodes=(), n_topics=0):
+    """
+    Return the source of the document describing package ``pkg`` and the
+    given nodes.
+    """
+    name = 'bench_pkg_{}'.format(pkg)
+    lines = [name, '=' * len(name), '', '.. ros:package:: ' + name, '']
+    for msg in range(n_messages):
+        lines += ['.. ros:message:: Msg{}'.format(msg), '',
+                  '  Message {} of {}.'.format(msg, name), '']
+        for field in range(n_fields):
+            if field % 3 == 0:
+                type_ = PRIMITIVES[field % len(PRIMITIVES)]
+            elif field % 3 == 1:
+                type_ = '{}/Msg{}'.format(name, (msg + field) % n_messages)
+            else:
+                type_ = 'bench_pkg_{}/Msg{}'.format(
+                    (pkg + field) % n_packages, (msg * field) % n_messages)
+            lines += ['  :msg_param field{}: Field {}.'.format(field, field),
+                      '  :msg_paramtype field{}: {}'.format(field, type_)]
+        lines.append('')
+    for srv in range(n_services):
+        lines += ['.. ros:service:: Srv{}'.format(srv), '',
+                  '  :req_param request: The request.',
+                  '  :req_paramtype request: {}/Msg{}'.format(
+                      name, srv % n_messages),
+                  '  :resp_param ok: Success.',
+                  '  :resp_paramtype ok: bool', '']
+    for node in nodes:
+        lines += ['.. ros:node:: /bench/node{}'.format(node), '']
+        for i in range(TOPICS_PER_NODE):
+            for kind, topic in [('pub', node * TOPICS_PER_NODE + i),
+                                ('sub', node * 7 + i * 13)]:
+                topic = 'topic{}'.format(topic % n_topics)
+                lines += ['  :{} {}: Topic.'.format(kind, topic),
+                          '  :{}type {}: {}/Msg{}'.format(
+                              kind, topic, name, i % n_messages)]
+        lines.append('')
+    lines += ['See :ros:msg:`bench_pkg_{}/Msg0` and :ros:pkg:`{}`.'.format(
+        (pkg + 1) % n_packages, name), '']
+    return '\n'.join(lines)
+
+
+def generate_project(path, n_packages, n_messages, n_fields, n_services,
+                     n_nodes=0, n_topics=0):
+    """
+    Write a synthetic project to ``path``.
+    """
+    with open(os.path.join(path, 'conf.py'), 'w') as f:
+        f.write(CONF_PY.format(root=ROOT))
+    docnames = []
+    for pkg in range(n_packages):
+        docname = 'pkg{}'.format(pkg)
+        docnames.append(docname)
+        with open(os.path.join(path, docname + '.rst'), 'w') as f:
+            f.write(package_rst(pkg, n_packages, n_messages, n_fields,
+                                n_services, range(pkg, n_nodes, n_packages),
+                                n_topics))
+    with open(os.path.join(path, 'index.rst'), 'w') as f:
+        f.write('Benchmark\n=========\n\n.. toctree::\n\n')
+        f.writelines('   {}\n'.format(docname) for docname in docnames)
+        f.write('\n* :ref:`ros-pkgindex`\n* :ref:`ros-msgindex`\n')
+        if n_nodes:
+            f.write('* :ref:`ros-topicindex`\n')
+
+
+def build(srcdir, outdir, builder, jobs):
+    """
+    Build the project in the current process and return the measurements.
+    This is run in a child process, see :func:`run_build`.
+    """
+    import resource
+    from sphinx.application import Sphinx
+    from sphinx_ros.domain import RosDomain
+    from sphinx_ros.indices import RosTopicIndex
+    from sphinx_ros.references import RosReferencesResolver
+
+    stats = {'resolve_xref': 0.0, 'resolve_xref_calls': 0, 'index': 0.0}
+    stamps = {}
+
+    def timed(func, key, count_key=None):
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats[key] += time.time() - start
+                if count_key:
+                    stats[count_key] += 1
+        return wrapper
+
+    RosDomain.resolve_xref = timed(RosDomain.resolve_xref, 'resolve_xref',
+                                   'resolve_xref_calls')
+    RosReferencesResolver.apply = timed(RosReferencesResolver.apply,
+                                        'resolve_xref')
+    RosDomain.get_index_content = timed(RosDomain.get_index_content, 'index')
+    RosTopicIndex.generate = timed(RosTopicIndex.generate, 'index')
+
+    def stamp(key):
+        def handler(*args):
+            stamps.setdefault(key, time.time())
+        return handler
+
+    start = time.time()
+    app = Sphinx(srcdir, srcdir, outdir, os.path.join(outdir, '.doctrees'),
+                 builder, status=None, warning=sys.stderr, parallel=jobs)
+    app.connect('env-before-read-docs', stamp('read_start'))
+    app.connect('env-updated', stamp('read_end'))
+    app.build()
+    end = time.time()
+
+    read_start = stamps.get('read_start', end)
+    read_end = stamps.get('read_end', read_start)
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    env_pickle_bytes, env_pickle_load = load_environment(
+        os.path.join(outdir, '.doctrees', 'environment.pickle'))
+    return {
+        'read': read_end - read_start,
+        'resolve_xref': stats['resolve_xref'],
+        'resolve_xref_calls': stats['resolve_xref_calls'],
+        'index': stats['index'],
+        'write': end - read_end,
+        'total': end - start,
+        'peak_memory_kb': peak_memory,
+        'env_pickle_bytes': env_pickle_bytes,
+        'env_pickle_load': env_pickle_load,
+    }
+
+
+def load_environment(filename):
+    """
+    Return the size of the pickled environment and the best time of three
+    to load it.
+    """
+    from six.moves import cPickle as pickle
+
+    with open(filename, 'rb') as f:
+        data = f.read()
+    times = []
+    for _ in range(3):
+        start = time.time()
+        pickle.loads(data)
+        times.append(time.time() - start)
+    return len(data), min(times)
+
+
+def run_build(srcdir, outdir, builder, jobs):
+    """
+    Build the project in a child process and return the measurements.
+    """
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--build-only', srcdir,
+         outdir, builder, str(jobs)])
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--packages', type=int, nargs='+', default=[10],
+                        help='numbers of packages, one project per number')
+    parser.add_argument('--messages', type=int, default=20,
+                        help='number of messages per package')
+    parser.add_argument('--fields', type=int, default=8,
+                        help='number of fields per message')
+    parser.add_argument('--services', type=int, default=5,
+                        help='number of services per package')
+    parser.add_argument('--nodes', type=int, default=0,
+                        help='number of nodes of the computation graph')
+    parser.add_argument('--topics', type=int, default=3000,
+                        help='number of topics the nodes publish and '
+                             'subscribe to')
+    parser.add_argument('--builder', default='html')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='number of parallel processes of sphinx-build')
+    parser.add_argument('--output', help='write the results to this file')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the generated projects')
+    args = parser.parse_args(argv)
+
+    import sphinx
+    import sphinx_ros
+    results = {
+        'python': platform.python_version(),
+        'sphinx': sphinx.__display_version__,
+        'sphinx_ros': sphinx_ros.get_version(),
+        'builder': args.builder,
+        'jobs': args.jobs,
+        'runs': [],
+    }
+    for n_packages in args.packages:
+        path = tempfile.mkdtemp(prefix='sphinx_ros_benchmark_')
+        try:
+            srcdir = os.path.join(path, 'src')
+            outdir = os.path.join(path, 'build')
+            os.mkdir(srcdir)
+            generate_project(srcdir, n_packages, args.messages, args.fields,
+                             args.services, args.nodes, args.topics)
+            run = {
+                'packages': n_packages,
+                'messages': args.messages,
+                'fields': args.fields,
+                'services': args.services,
+                'nodes': args.nodes,
+                'topics': args.topics,
+                'objects': n_packages * (1 + args.messages + args.services) +
+                args.nodes,
+            }
+            run['full'] = run_build(srcdir, outdir, args.builder, args.jobs)
+            # Touch a single document and build again
+            os.utime(os.path.join(srcdir, 'pkg0.rst'), None)
+            run['incremental'] = run_build(srcdir, outdir, args.builder,
+                                           args.jobs)
+            results['runs'].append(run)
+            print('{} packages, {} objects: full {:.2f} s, '
+                  'incremental {:.2f} s'.format(
+                      n_packages, run['objects'], run['full']['total'],
+                      run['incremental']['total']), file=sys.stderr)
+        finally:
+            if args.keep:
+                print('kept project in ' + path, file=sys.stderr)
+            else:
+                shutil.rmtree(path)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, ROOT)
+    if len(sys.argv) == 6 and sys.argv[1] == '--build-only':
+        print(json.dumps(build(sys.argv[2], sys.argv[3], sys.argv[4],
+                               int(sys.argv[5]))))
+    else:
+        main()
@@ -0,0 +1,94 @@
+"""
+Import time of the ``sphinx_ros`` extension.
+
+Runs ``python -X importtime -c 'import sphinx_ros'`` (Python 3.7 or newer) in
+a fresh interpreter a number of times and reports the cumulative import time
+of the ``sphinx_ros`` package as JSON. With ``--max-ms`` the script exits with
+a nonzero status if the best run is slower, so it can be used to keep the
+startup of ``sphinx-build`` and its worker processes lean. It runs with
+every push in the ``checks`` workflow, ``.github/workflows/checks.yml``::
+
+    python benchmarks/import_time.py --runs 5 --max-ms 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module):
+    """
+    Return the cumulative import time of ``module`` in microseconds and the
+    slowest modules imported by it, measured in a fresh interpreter.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in env.get('PYTHONPATH', '').split(os.pathsep)
+                  if p])
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.STDOUT, env=env).decode('utf-8')
+
+    # Nested imports are listed before the importing module, indented deeper
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or line.count('|') != 2:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(cumulative)
+        except ValueError:
+            continue  # the header line
+        indent = len(name) - len(name.lstrip())
+        imports.append((indent, cumulative, name.strip()))
+
+    for i, (indent, total, name) in enumerate(imports):
+        if name == module:
+            break
+    else:
+        raise RuntimeError('{} was not imported'.format(module))
+    nested = []
+    for nested_indent, cumulative, name in reversed(imports[:i]):
+        if nested_indent <= indent:
+            break
+        nested.append((cumulative, name))
+    return total, sorted(nested, reverse=True)[:5]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--module', default='sphinx_ros')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-ms', type=float,
+                        help='fail if the best run takes longer than this')
+    args = parser.parse_args(argv)
+
+    if sys.version_info < (3, 7):
+        parser.error('-X importtime requires Python 3.7 or newer')
+
+    runs = [import_time(args.module) for _ in range(args.runs)]
+    best_us, slowest = min(runs)
+    results = {
+        'module': args.module,
+        'python': sys.version.split()[0],
+        'runs_ms': [run[0] / 1000.0 for run in runs],
+        'best_ms': best_us / 1000.0,
+        'slowest_imports_ms': dict((name, us / 1000.0)
+                                   for us, name in slowest),
+    }
+    print(json.dumps(results, indent=2, sort_keys=True))
+    if args.max_ms is not None and results['best_ms'] > args.max_ms:
+        print('importing {} took {:.1f} ms, more than {:.1f} ms'.format(
+            args.module, results['best_ms'], args.max_ms), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
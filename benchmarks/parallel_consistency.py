@@ -0,0 +1,125 @@
+"""
+Consistency of serial and parallel builds of the ``sphinx_ros`` extension.
+
+Generates a synthetic project like ``benchmark.py``, builds it once with
+``-j 1`` and once with ``-j N``, and checks that both builds write the same
+``objects.inv`` inventory, i.e. that merging the domain data of parallel
+readers gives the same objects as reading all documents in one process. The
+entries that differ are listed and the script exits with a nonzero status,
+so it can run in CI::
+
+    python benchmarks/parallel_consistency.py --jobs 4
+    python benchmarks/parallel_consistency.py --packages 20 --nodes 50
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmark import ROOT, generate_project
+
+
+def build(srcdir, outdir, builder, jobs):
+    """
+    Build the project with ``sphinx-build`` in a child process and return
+    the path to the inventory it wrote.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    subprocess.check_call(
+        [sys.executable, '-m', 'sphinx', '-b', builder, '-q', '-j', str(jobs),
+         '-d', os.path.join(outdir, '.doctrees'), srcdir, outdir], env=env)
+    return os.path.join(outdir, 'objects.inv')
+
+
+def load_inventory(filename):
+    """
+    Return the entries of an inventory as a set of (type, name, entry)
+    tuples.
+    """
+    from sphinx.util.inventory import InventoryFile
+
+    with open(filename, 'rb') as f:
+        inventory = InventoryFile.load(f, '', os.path.join)
+    return set((type_, name, entry) for type_, entries in
+               inventory.items() for name, entry in entries.items())
+
+
+def compare(serial, parallel):
+    """
+    Return the lines describing the differences between two inventories, or
+    an empty list if they are identical.
+    """
+    with open(serial, 'rb') as f:
+        serial_data = f.read()
+    with open(parallel, 'rb') as f:
+        parallel_data = f.read()
+    if serial_data == parallel_data:
+        return []
+    serial_entries = load_inventory(serial)
+    parallel_entries = load_inventory(parallel)
+    lines = ['- {}:{} {}'.format(type_, name, entry[2]) for type_, name, entry
+             in sorted(serial_entries - parallel_entries)]
+    lines += ['+ {}:{} {}'.format(type_, name, entry[2]) for type_, name, entry
+              in sorted(parallel_entries - serial_entries)]
+    return lines or ['the inventories differ in their order or header']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--packages', type=int, default=10,
+                        help='number of packages')
+    parser.add_argument('--messages', type=int, default=20,
+                        help='number of messages per package')
+    parser.add_argument('--fields', type=int, default=8,
+                        help='number of fields per message')
+    parser.add_argument('--services', type=int, default=5,
+                        help='number of services per package')
+    parser.add_argument('--nodes', type=int, default=0,
+                        help='number of nodes of the computation graph')
+    parser.add_argument('--topics', type=int, default=300,
+                        help='number of topics the nodes publish and '
+                             'subscribe to')
+    parser.add_argument('--builder', default='html')
+    parser.add_argument('--jobs', type=int, default=4,
+                        help='number of parallel processes of the parallel '
+                             'build')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the generated project and builds')
+    args = parser.parse_args(argv)
+
+    path = tempfile.mkdtemp(prefix='sphinx_ros_parallel_')
+    try:
+        srcdir = os.path.join(path, 'src')
+        os.mkdir(srcdir)
+        generate_project(srcdir, args.packages, args.messages, args.fields,
+                         args.services, args.nodes, args.topics)
+        serial = build(srcdir, os.path.join(path, 'j1'), args.builder, 1)
+        parallel = build(srcdir, os.path.join(path, 'j{}'.format(args.jobs)),
+                         args.builder, args.jobs)
+        differences = compare(serial, parallel)
+    finally:
+        if args.keep:
+            print('kept project in ' + path, file=sys.stderr)
+        else:
+            shutil.rmtree(path)
+
+    if differences:
+        print('objects.inv of -j 1 and -j {} differ:'.format(args.jobs),
+              file=sys.stderr)
+        for line in differences:
+            print('  ' + line, file=sys.stderr)
+        return 1
+    print('objects.inv of -j 1 and -j {} are identical'.format(args.jobs),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,7 +6,8 @@ with open('README.rst') as f:
 
 requires = [
     'Sphinx>=1.8',
-    'setuptools>=20.7',
+    'six',
+    'importlib_metadata; python_version < "3.8"',
     'rospkg'
 ]
 project_urls = {
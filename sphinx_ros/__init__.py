@@ -3,44 +3,138 @@
 =====================
 
 Sphinx extension adding several directives to document ROS packages.
+
+Importing this module is cheap: the version is only looked up when
+``__version__`` is accessed (on import before Python 3.7) or the extension is
+set up, and the modules of the extension are imported by :func:`setup`.
 """
 
-from pkg_resources import get_distribution, DistributionNotFound
+import sys
+
+
+def get_version():
+    """
+    Return the version of the installed ``sphinx-ros`` distribution, or
+    ``'unknown'`` if it is not installed. The version is looked up once per
+    process.
+
+    :rtype: str
+    """
+    if '__version__' not in globals():
+        globals()['__version__'] = _find_version()
+    return globals()['__version__']
 
-try:
-    from sphinx.domains import StandardDomain
-except ImportError:
-    from sphinx.domains.std import StandardDomain
-from .domain import RosDomain
 
-try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
-    # Package is not installed
-    __version__ = 'unknown'
+def _find_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        try:
+            from importlib_metadata import version, PackageNotFoundError
+        except ImportError:
+            return 'unknown'
+    try:
+        return version('sphinx-ros')
+    except PackageNotFoundError:
+        # Package is not installed
+        return 'unknown'
+
+
+def __getattr__(name):
+    # Look up the version lazily, see PEP 562
+    if name == '__version__':
+        return get_version()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(
+        __name__, name))
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ is ignored before Python 3.7
+    get_version()
 
 
 def setup(app):
     """
     Adds the ROS domain to the Sphinx application and the labels to the ROS
     indices to the standard domain. It also adds the configuration values
-    :confval:`ros_add_package_names` and :confval:`ros_msg_reference_version`.
+    :confval:`ros_add_package_names`, :confval:`ros_msg_reference_version`,
+    :confval:`ros_type_inventories`, :confval:`ros_build_stats`,
+    :confval:`ros_type_hashes`, :confval:`ros_message_sizes`,
+    :confval:`ros_interface_paths`, :confval:`ros_parse_workers`,
+    :confval:`ros_system_interfaces`, :confval:`ros_message_index_pages`,
+    and :confval:`ros_type_catalog`.
 
     :param app: The Sphinx application
     :type app: sphinx.application.Sphinx
     """
+    try:
+        from sphinx.domains import StandardDomain
+    except ImportError:
+        from sphinx.domains.std import StandardDomain
+    from .catalog import add_type_finder, write_type_catalog
+    from .consistency import check_field_types
+    from .domain import RosDomain
+    from .interfaces import load_interface_cache, save_interface_cache, \
+        attach_interface_cache, detach_interface_cache, \
+        merge_interface_cache, parse_interface_files, find_outdated_docs
+    from .indices import update_index_cache, collect_index_pages
+    from .inventory import load_type_inventories, load_system_interfaces
+    from .references import RosReferencesResolver
+    from .search import add_field_objects
+    from .stats import init_build_stats, stamp_read_start, stamp_read_end, \
+        merge_build_stats, write_build_stats
+    from .typeinfo import RosTypeInfoTransform, RosSizeTableTransform, \
+        check_type_hashes, note_changed_typeinfo
+
     app.add_domain(RosDomain)
+    app.add_post_transform(RosReferencesResolver)
+    app.add_post_transform(RosTypeInfoTransform)
+    app.add_post_transform(RosSizeTableTransform)
+    app.connect('config-inited', check_type_hashes)
+    app.connect('builder-inited', init_build_stats)
+    app.connect('builder-inited', load_interface_cache)
+    app.connect('builder-inited', load_type_inventories)
+    app.connect('builder-inited', load_system_interfaces)
+    app.connect('builder-inited', add_type_finder)
+    app.connect('env-get-outdated', find_outdated_docs)
+    app.connect('env-before-read-docs', stamp_read_start)
+    app.connect('env-before-read-docs', parse_interface_files)
+    app.connect('env-before-read-docs', attach_interface_cache)
+    app.connect('env-merge-info', merge_interface_cache)
+    app.connect('env-merge-info', merge_build_stats)
+    app.connect('env-updated', stamp_read_end)
+    app.connect('env-updated', update_index_cache)
+    app.connect('env-updated', detach_interface_cache)
+    app.connect('env-get-updated', note_changed_typeinfo)
+    app.connect('env-check-consistency', check_field_types)
+    app.connect('html-collect-pages', collect_index_pages)
+    app.connect('html-page-context', add_field_objects)
+    app.connect('build-finished', write_build_stats)
+    app.connect('build-finished', save_interface_cache)
+    app.connect('build-finished', write_type_catalog)
 
     app.add_config_value('ros_add_package_names', True, 'html')
     app.add_config_value('ros_msg_reference_version', 'melodic', 'html')
+    app.add_config_value('ros_type_inventories', [], 'env')
+    app.add_config_value('ros_build_stats', None, '')
+    app.add_config_value('ros_type_hashes', [], 'html')
+    app.add_config_value('ros_message_sizes', False, 'html')
+    app.add_config_value('ros_interface_paths', [], '')
+    app.add_config_value('ros_parse_workers', None, '')
+    app.add_config_value('ros_system_interfaces', False, 'env')
+    app.add_config_value('ros_message_index_pages', None, 'html')
+    app.add_config_value('ros_type_catalog', False, 'html')
 
     StandardDomain.initial_data['labels'].\
         update(RosDomain.initial_data['labels'])
     StandardDomain.initial_data['anonlabels'].\
         update(RosDomain.initial_data['anonlabels'])
 
+    # Sphinx needs the version in the metadata of the extension, so it is
+    # looked up here, once per process: the parallel readers and writers are
+    # forked after the setup and do not look it up again.
     return {
-        'version': __version__,
-        'parallel_read_safe': False,
+        'version': get_version(),
+        'parallel_read_safe': True,
         'parallel_write_safe': True
     }
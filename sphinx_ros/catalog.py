@@ -0,0 +1,154 @@
+"""
+``sphinx_ros.catalog`` module
+=============================
+
+This module writes the type catalog of :confval:`ros_type_catalog`: a static
+JSON description of all documented packages, messages, services, and
+actions, with the fields of the types, for the type finder of
+:rst:dir:`ros:typefinder`. The catalog consists of a shard per package and
+an index listing them. The file name of a shard contains the hash of its
+contents, so a shard is only written when its package changed, and browsers
+can keep the shards of unchanged packages cached.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+
+from six import iteritems, text_type
+from sphinx.util import logging
+from .directives import field_fullname
+from .domain import split_fullname
+
+logger = logging.getLogger(__name__)
+
+#: The directory of the catalog, relative to the output directory.
+catalog_dir = '_ros'
+#: The name of the index of the catalog.
+catalog_index = 'types.json'
+#: Bump when the layout of the catalog changes.
+catalog_version = 1
+#: The type finder script, in the ``static`` directory of this package.
+finder_script = 'ros_type_finder.js'
+
+shard_name_re = re.compile(r'[^A-Za-z0-9_]')
+
+
+def dump_json(data):
+    """
+    Return data as compact JSON, with sorted keys so that equal data gives
+    equal text.
+    """
+    return text_type(json.dumps(data, ensure_ascii=True,
+                                separators=(',', ':'), sort_keys=True))
+
+
+def get_catalog_packages(domain, builder):
+    """
+    Return the packages and types of the catalog, from the objects and the
+    field data of the ROS domain. A type is listed with its short name, its
+    role, e.g. ``'msg'``, its URI relative to the output directory, and its
+    fields and constants as ``[path, type]`` or ``[path, type, value]``
+    lists, e.g. ``['request.id', 'int32']``.
+
+    :param domain: The ROS domain
+    :type domain: sphinx_ros.domain.RosDomain
+    :param builder: The HTML builder giving the URIs of the documents
+    :return: A dictionary of package name -> shard data.
+    :rtype: dict
+    """
+    fields = domain.data['fields']
+    packages = {}
+
+    def get_package(pkgname):
+        return packages.setdefault(pkgname, {'package': pkgname, 'uri': None,
+                                             'types': []})
+
+    for name, _, objtype, docname, anchor, _ in domain.get_objects():
+        if objtype == 'package':
+            uri = builder.get_target_uri(docname) + '#' + anchor
+            get_package(name)['uri'] = uri
+        elif objtype in ('message', 'service', 'action'):
+            pkgname, shortname = split_fullname(name, objtype)
+            entry = fields.get(name)
+            type_fields = []
+            if entry is not None and entry[0] == docname:
+                for docfield, fieldname, type_, value, _ in entry[1]:
+                    path = field_fullname(name, docfield,
+                                          fieldname)[len(name) + 1:]
+                    field = [path, type_ or '']
+                    if docfield.endswith('constant') and value is not None:
+                        field.append(value)
+                    type_fields.append(field)
+            get_package(pkgname)['types'].append([
+                shortname, domain.role_for_objtype(objtype),
+                builder.get_target_uri(docname) + '#' + anchor, type_fields])
+    for package in packages.values():
+        package['types'].sort()
+    return packages
+
+
+def get_shard_name(pkgname, text):
+    """
+    Return the file name of the shard of a package, with the hash of its
+    contents, e.g. ``'foo_pkg.0123456789ab.json'``.
+    """
+    digest = hashlib.md5(text.encode('utf-8')).hexdigest()[:12]
+    return '{}.{}.json'.format(shard_name_re.sub('_', pkgname) or '_',
+                               digest)
+
+
+def write_type_catalog(app, exception):
+    """
+    Handler for the ``build-finished`` event, writing the type catalog if
+    :confval:`ros_type_catalog` is set and the builder writes HTML pages.
+    Shards that exist already are kept, and shards that are no longer listed
+    are removed.
+    """
+    builder = app.builder
+    if exception is not None or not app.config.ros_type_catalog or \
+            builder.format != 'html' or getattr(builder, 'embedded', True):
+        return
+    outdir = os.path.join(builder.outdir, catalog_dir)
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    packages = get_catalog_packages(app.env.get_domain('ros'), builder)
+    index = []
+    written = 0
+    for pkgname, package in sorted(iteritems(packages)):
+        text = dump_json(package)
+        shard = get_shard_name(pkgname, text)
+        filename = os.path.join(outdir, shard)
+        if not os.path.exists(filename):
+            with io.open(filename, 'w', encoding='utf-8') as f:
+                f.write(text)
+            written += 1
+        index.append([pkgname, shard, len(package['types'])])
+    with io.open(os.path.join(outdir, catalog_index), 'w',
+                 encoding='utf-8') as f:
+        f.write(dump_json({'version': catalog_version, 'packages': index}))
+
+    shards = set(shard for _, shard, _ in index)
+    for name in os.listdir(outdir):
+        if name.endswith('.json') and name != catalog_index and \
+                name not in shards:
+            os.remove(os.path.join(outdir, name))
+    logger.verbose('ROS type catalog: %d of %d shards written', written,
+                   len(index))
+
+
+def add_type_finder(app):
+    """
+    Handler for the ``builder-inited`` event, adding the type finder script
+    to the HTML pages if :confval:`ros_type_catalog` is set.
+    """
+    if not app.config.ros_type_catalog or app.builder.format != 'html':
+        return
+    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'static')
+    if static_dir not in app.config.html_static_path:
+        app.config.html_static_path.append(static_dir)
+    app.add_js_file(finder_script)
@@ -0,0 +1,36 @@
+"""
+``sphinx_ros.consistency`` module
+=================================
+
+This module checks the ROS domain data once all documents are read. The
+types of the fields of all messages, services, and actions are looked up in
+a single pass, and the types that can not be resolved are reported in one
+warning, grouped by package, so that ``sphinx-build -W`` fails on them.
+"""
+
+from six import iteritems
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+
+def check_field_types(app, env):
+    """
+    Handler for the ``env-check-consistency`` event, warning about the field
+    types that are neither documented in the project nor found in the
+    inventories of :confval:`ros_type_inventories` or, with
+    :confval:`ros_system_interfaces`, in the installed packages. The warning
+    can be suppressed with ``suppress_warnings = ['ros.fieldtype']``.
+    """
+    unresolved = env.get_domain('ros').get_unresolved_field_types()
+    if not unresolved:
+        return
+    lines = []
+    for pkgname, types in sorted(iteritems(unresolved)):
+        lines.append('  {}:'.format(pkgname or '(no package)'))
+        for type_, docnames in sorted(iteritems(types)):
+            lines.append('    {} (in {})'.format(
+                type_, ', '.join(sorted(docnames))))
+    logger.warning('%d unresolved ROS field types:\n%s',
+                   sum(len(types) for types in unresolved.values()),
+                   '\n'.join(lines), type='ros', subtype='fieldtype')
@@ -5,20 +5,27 @@
 
 """
 
+import os
 import re
 import sphinx
 
 from docutils import nodes
 from docutils.parsers.rst import directives, Directive
+from docutils.statemachine import StringList
 from sphinx import addnodes
 from sphinx.directives import ObjectDescription
 from sphinx.util.docfields import Field, TypedField
+from .interfaces import get_interface_cache, split_array_type, \
+    interface_kinds, interface_syntax, InterfaceParseError
+from .stats import get_build_stats, timed
+from .typeinfo import typeinfo, sizetable
+from .xref_role import RosXRefRole
 
 
 ros_sig_re = re.compile(
-    r'''^((?:[^\.]*\.)*?)         # package name
-         (?:(msg|srv|action)\.)?  # object type
-         (\w+) \s*?$              # thing name
+    r'''^((?:[^\./]*[\./])*?)       # package name
+         (?:(msg|srv|action)[\./])?  # object type
+         (\w+) \s*?$                # thing name
      ''', re.VERBOSE)
 
 
@@ -26,12 +33,54 @@ def name_to_key(name):
     return unicode(name[0].upper())
 
 
+#: doc field name prefix -> section of a service or action
+field_sections = {
+    'req': 'request',
+    'resp': 'response',
+    'goal': 'goal',
+    'result': 'result',
+    'feedback': 'feedback',
+}
+
+
+def field_fullname(fullname, docfield, name):
+    """
+    Return the full name of a field or constant of a message, service, or
+    action, e.g. ``'foo_pkg.srv.Foo.request.id'`` for the parameter ``id`` of
+    the doc field ``req_parameter`` of ``foo_pkg.srv.Foo``.
+    """
+    prefix = docfield.partition('_')[0]
+    if prefix in field_sections:
+        fullname += '.' + field_sections[prefix]
+    return fullname + '.' + name
+
+
+def field_comment(content, value=None):
+    """
+    Return the first line of the description of a field or constant, without
+    the value the description of a constant starts with (see
+    :meth:`RosTypedField.field_definition`), or ``''`` if there is none.
+    """
+    text = ''.join(node.astext() for node in content).strip()
+    if value is not None and text.startswith(value):
+        text = text[len(value):].lstrip()
+        if text.startswith('--'):
+            text = text[2:].lstrip()
+    return text.split('\n', 1)[0].strip()
+
+
 def split_pkg_object(signature, obj_type):
+    """
+    Split the name of a type into package and type name, e.g.
+    ``'foo_pkg.msg.Foo'``, ``'foo_pkg/msg/Foo'`` (ROS 2), and
+    ``'foo_pkg/Foo'`` into ``('foo_pkg', 'Foo')``.
+    """
     try:
         pkg, object_ = signature.split('.' + obj_type + '.')
     except ValueError:
         try:
-            pkg, object_ = signature.split('/')
+            pkg, object_ = signature.replace('/' + obj_type + '/',
+                                             '/').split('/')
         except ValueError:
             pkg = ''
             object_ = signature
@@ -52,6 +101,9 @@ class RosXRefMixin(object):
                                                          target, innernode,
                                                          contnode)
         result['refspecific'] = True
+        if env is not None:
+            result['ros:package'] = env.ref_context.get('ros:package')
+            result['ros:node'] = env.ref_context.get('ros:node')
         if target.startswith(('.', '~')):
             prefix, result['reftarget'] = target[0], target[1:]
             if prefix == '.':
@@ -87,6 +139,7 @@ class RosObject(ObjectDescription):
         """
         return ''
 
+    @timed('handle_signature')
     def handle_signature(self, sig, signode):
         """
         Transform a ROS signature into rST nodes.
@@ -146,6 +199,7 @@ class RosObject(ObjectDescription):
         """
         raise NotImplementedError('must be implemented in subclasses')
 
+    @timed('add_target_and_index')
     def add_target_and_index(self, name, sig, signode):
         pkgname = self.options.get('package',
                                    self.env.ref_context.get('ros:package'))
@@ -176,7 +230,85 @@ class RosField(RosXRefMixin, Field):
 
 
 class RosTypedField(RosXRefMixin, TypedField):
-    pass
+    def make_xref(self, rolename, domain, target, innernode=nodes.emphasis,
+                  contnode=None, env=None):
+        result = super(RosTypedField, self).make_xref(
+            rolename, domain, target, innernode, contnode, env)
+        # Unresolved field types are reported by
+        # sphinx_ros.consistency.check_field_types()
+        result['ros:fieldtype'] = True
+        return result
+
+    def make_field(self, types, domain, items, env=None):
+        obj = env is not None and env.temp_data.get('object')
+        if obj:
+            fields = [(self.name, fieldarg) +
+                      self.field_definition(env, types.get(fieldarg, ()),
+                                            content)
+                      for fieldarg, content in items]
+            env.get_domain('ros').note_fields(obj[0], fields, env.docname)
+            comments = [(field_fullname(obj[0], self.name, field[1]),
+                         field_comment(content, field[3]))
+                        for field, (_, content) in zip(fields, items)]
+            comments = [entry for entry in comments if entry[1]]
+            if comments:
+                env.get_domain('ros').note_field_comments(obj[0], comments,
+                                                          env.docname)
+        field = super(RosTypedField, self).make_field(types, domain, items,
+                                                      env)
+        if obj:
+            # Targets of the fields in the search index, see
+            # sphinx_ros.search.RosIndexBuilder
+            body = field[1][0]
+            if isinstance(body, nodes.paragraph):
+                paragraphs = [body]
+            else:
+                paragraphs = [item[0] for item in body]
+            for par, (fieldarg, _) in zip(paragraphs, items):
+                par['ids'].append(field_fullname(obj[0], self.name, fieldarg))
+        return field
+
+    def field_definition(self, env, fieldtype, content):
+        """
+        Return the type of a field, its value if the description starts with
+        a literal (as for the constants of the auto directives), and the
+        (package, target, role, searchmode) lookup of the type if it is not
+        primitive. The type is either plain text that is turned into a
+        reference by make_xref(), or made with the ROS roles.
+        """
+        type_ = ''.join(node.astext() for node in fieldtype)
+        value = None
+        node = content and content[0]
+        while isinstance(node, nodes.inline) and node.children:
+            node = node[0]  # the translatable content of the doc field
+        if isinstance(node, nodes.literal):
+            value = node.astext()
+        base = split_array_type(type_.lstrip('.~'))[0]
+        if not base or base in RosXRefRole.ros_msg_primitives:
+            return type_, value, None
+
+        if len(fieldtype) == 1 and isinstance(fieldtype[0], nodes.Text):
+            return type_, value, (env.ref_context.get('ros:package'), base,
+                                  self.typerolename, 1)
+        for fieldnode in fieldtype:
+            if not isinstance(fieldnode, nodes.Element):
+                continue
+            for node in fieldnode.traverse(addnodes.pending_xref):
+                if node.get('refdomain') == 'ros':
+                    node['ros:fieldtype'] = True
+                    return type_, value, (node.get('ros:package'),
+                                          node['reftarget'], node['reftype'],
+                                          node.get('refspecific') and 1 or 0)
+        # A type linked to the API documentation of ROS
+        if base == 'Header':
+            base = 'std_msgs/Header'
+        if '/' in base:
+            parts = base.split('/')
+            kind = len(parts) == 3 and parts[1] or 'msg'
+            return type_, value, (None, '.'.join([parts[0], kind, parts[-1]]),
+                                  'msg', 0)
+        return type_, value, (env.ref_context.get('ros:package'), base, 'msg',
+                              1)
 
 
 class RosType(RosObject):
@@ -184,6 +316,7 @@ class RosType(RosObject):
     Super class for messages, services, and actions.
     """
 
+    @timed('handle_signature')
     def handle_signature(self, sig, signode):
         pkg, name = split_pkg_object(sig, self.get_object_type_prefix())
         env_pkg = self.options.get('package',
@@ -231,6 +364,7 @@ class RosType(RosObject):
             text = '{} ({})'.format(fullname, self.objtype)
         return text
 
+    @timed('add_target_and_index')
     def add_target_and_index(self, name, sig, signode):
         pkgname = self.options.get('package',
                                    self.env.ref_context.get('ros:package'))
@@ -258,15 +392,9 @@ class RosType(RosObject):
                 # self.indexnode['entries'].append(entry)
 
     def add_object_to_domain_data(self, fullname, obj_type):
-        objects = self.env.domaindata['ros']['objects']
-        if fullname in objects:
-            self.state_machine.reporter.warning(
-                'duplicate object description of %s, ' % fullname +
-                'other instance in ' +
-                self.env.doc2path(objects[fullname][0]) +
-                ', use :noindex: for one of them',
-                line=self.lineno)
-        objects[fullname] = (self.env.docname, self.objtype)
+        ros_domain = self.env.get_domain('ros')
+        ros_domain.note_object(fullname, self.objtype, self.env.docname,
+                               location=(self.env.docname, self.lineno))
 
 
 class RosCurrentPackageDirective(Directive):
@@ -291,6 +419,49 @@ class RosCurrentPackageDirective(Directive):
         return []
 
 
+class RosSizeTableDirective(Directive):
+    """
+    Directive for a table of the serialized sizes of all documented message
+    types, sorted by size.
+    """
+
+    has_content = False
+    required_arguments = 0
+    optional_arguments = 0
+    option_spec = {}
+
+    def run(self):
+        env = self.state.document.settings.env
+        env.get_domain('ros').note_size_table(env.docname)
+        return [sizetable('')]
+
+
+class RosTypeFinderDirective(Directive):
+    """
+    Directive for a search box finding the types of the type catalog, see
+    :confval:`ros_type_catalog`. It only outputs HTML.
+    """
+
+    has_content = False
+    required_arguments = 0
+    optional_arguments = 0
+    option_spec = {}
+
+    html = ('<div class="ros-typefinder">'
+            '<input type="search" placeholder="Find a ROS type" '
+            'autocomplete="off" />'
+            '<ul class="ros-typefinder-results"></ul>'
+            '</div>')
+
+    def run(self):
+        env = self.state.document.settings.env
+        if not env.config.ros_type_catalog:
+            return [self.state.document.reporter.warning(
+                'ros:typefinder needs ros_type_catalog to be set',
+                line=self.lineno)]
+        return [nodes.raw('', self.html, format='html')]
+
+
 class RosPackageDirective(Directive):
     """
     Directive to mark description of a new package.
@@ -353,8 +524,27 @@ class RosActionDirective(RosType):
                       names=('feedback_param',),
                       typerolename='obj',
                       typenames=('feedback_paramtype',),
+                      can_collapse=True),
+        RosTypedField('goal_constant',
+                      label='Goal constants',
+                      names=('goal_const',),
+                      typerolename='obj',
+                      typenames=('goal_consttype',),
+                      can_collapse=True),
+        RosTypedField('result_constant',
+                      label='Result constants',
+                      names=('result_const',),
+                      typerolename='obj',
+                      typenames=('result_consttype',),
+                      can_collapse=True),
+        RosTypedField('feedback_constant',
+                      label='Feedback constants',
+                      names=('feedback_const',),
+                      typerolename='obj',
+                      typenames=('feedback_consttype',),
                       can_collapse=True)
     ]
+    interface_sections = ('goal', 'result', 'feedback')
 
 
 class RosServiceDirective(RosType):
@@ -374,8 +564,21 @@ class RosServiceDirective(RosType):
                       names=('resp_param',),
                       typerolename='obj',
                       typenames=('resp_paramtype',),
+                      can_collapse=True),
+        RosTypedField('req_constant',
+                      label='Request constants',
+                      names=('req_const',),
+                      typerolename='obj',
+                      typenames=('req_consttype',),
+                      can_collapse=True),
+        RosTypedField('resp_constant',
+                      label='Response constants',
+                      names=('resp_const',),
+                      typerolename='obj',
+                      typenames=('resp_consttype',),
                       can_collapse=True)
     ]
+    interface_sections = ('req', 'resp')
 
 
 class RosMessageDirective(RosType):
@@ -397,8 +600,273 @@ class RosMessageDirective(RosType):
                       typerolename='obj',
                       typenames=('msg_paramtype',),
                       can_collapse=True),
+        RosTypedField('constant',
+                      label='Constants',
+                      names=('msg_const',),
+                      typerolename='obj',
+                      typenames=('msg_consttype',),
+                      can_collapse=True)
     ]
+    interface_sections = ('msg',)
+
+    def run(self):
+        result = super(RosMessageDirective, self).run()
+        if self.names:
+            # Replaced by the users and the hashes of this type, see
+            # RosTypeInfoTransform
+            result[-1][-1] += typeinfo(reftarget=self.names[0][0])
+        return result
 
     def add_object_to_domain_data(self, fullname, obj_type):
         ros_domain = self.env.get_domain('ros')
-        ros_domain.add_message(fullname, 'deprecated' in self.options)
+        ros_domain.add_message(fullname, 'deprecated' in self.options,
+                               location=(self.env.docname, self.lineno))
+
+
+def escape_rst(text):
+    """
+    Escape the characters that would be interpreted as inline markup when
+    ``text`` is inserted in reStructuredText. The first character is always
+    escaped, so that e.g. ``J. Doe`` does not start an enumerated list.
+    """
+    text = re.sub(r'([\\*`|_])', r'\\\1', text)
+    if text and not text.startswith('\\'):
+        text = '\\' + text
+    return text
+
+
+class RosAutoType(object):
+    """
+    Mixin for directives that describe a ROS type by parsing its interface
+    file, a ``.msg``, ``.srv``, or ``.action`` file or an ``.idl`` file of ROS
+    2. The only argument is the path to the interface file, relative to
+    the current document or, if it starts with a slash, to the source
+    directory. The content of the directive is added to the description.
+
+    If no package is given with the ``:package:`` option or by a preceding
+    :rst:dir:`ros:package` directive, the package name is derived from the
+    path, e.g. ``foo_pkg/msg/Foo.msg``.
+    """
+
+    required_arguments = 1
+    optional_arguments = 0
+    final_argument_whitespace = True
+    has_content = True
+
+    def run(self):
+        env = self.state.document.settings.env
+        rel_filename, filename = env.relfn2path(self.arguments[0])
+        env.note_dependency(rel_filename)
+        # The kind of an .idl file is the kind of the directive
+        kind = None
+        if interface_syntax(filename) == 'idl':
+            kind = self.get_object_type_prefix()
+        try:
+            interface = get_interface_cache(env).parse(
+                filename, kind, stats=get_build_stats(env))
+        except (IOError, OSError) as exc:
+            return [self.state.document.reporter.warning(
+                'could not read interface file %r: %s' % (filename, exc),
+                line=self.lineno)]
+        except (InterfaceParseError, UnicodeError) as exc:
+            return [self.state.document.reporter.warning(
+                'could not parse interface file %r: %s' % (filename, exc),
+                line=self.lineno)]
+
+        # Describe the object as the corresponding non-auto directive would
+        domain, objtype = self.name.split(':', 1)
+        self.name = domain + ':' + objtype[len('auto'):]
+
+        name = os.path.splitext(os.path.basename(filename))[0]
+        pkgname = self.options.get('package',
+                                   env.ref_context.get('ros:package'))
+        if not pkgname:
+            pkgname = os.path.basename(os.path.dirname(
+                os.path.dirname(filename)))
+            name = pkgname + '/' + name
+        self.arguments = [name]
+
+        content = StringList()
+        if interface.comment:
+            content.append(escape_rst(interface.comment), filename)
+            content.append('', filename)
+        content.extend(self.content)
+        content.append('', filename)
+        for line in self.interface_to_rst(interface, pkgname):
+            content.append(line, filename)
+        self.content = content
+        ret = super(RosAutoType, self).run()
+        ros_domain = env.get_domain('ros')
+        for name in self.names:
+            ros_domain.note_source(env.docname, rel_filename, name[0])
+        return ret
+
+    def type_to_rst(self, type_, pkgname):
+        """
+        Return the reStructuredText referencing a field type. Types without
+        package that are neither primitive nor ``Header`` are defined in the
+        package of the interface itself.
+        """
+        base, suffix = split_array_type(type_)
+        if base in RosXRefRole.ros_msg_primitives or base == 'Header' or \
+                '/' in base or not pkgname:
+            text = ':ros:msg:`{}`'.format(base)
+        else:
+            text = ':ros:msg:`{} <{}/{}>`'.format(base, pkgname, base)
+        if suffix:
+            text += '\\ ' + escape_rst(suffix)
+        return text
+
+    def interface_to_rst(self, interface, pkgname):
+        """
+        Generate the reStructuredText lines describing the fields and
+        constants of the parsed interface with the doc fields of the
+        directive.
+        """
+        for prefix, section in zip(self.interface_sections,
+                                   interface.sections):
+            for field in section.fields:
+                description = escape_rst(field.comment)
+                if field.default is not None:
+                    description += ' (default: ``{}``)'.format(field.default)
+                yield ':{}_param {}: {}'.format(prefix, field.name,
+                                                description)
+                yield ':{}_paramtype {}: {}'.format(
+                    prefix, field.name, self.type_to_rst(field.type, pkgname))
+            for const in section.constants:
+                description = '``{}``'.format(const.value)
+                if const.comment:
+                    description += ' -- ' + escape_rst(const.comment)
+                yield ':{}_const {}: {}'.format(prefix, const.name,
+                                                description)
+                yield ':{}_consttype {}: {}'.format(
+                    prefix, const.name, self.type_to_rst(const.type, pkgname))
+
+
+class RosAutoMessageDirective(RosAutoType, RosMessageDirective):
+    """
+    Description of a ROS message type, generated from a ``.msg`` file.
+    """
+
+
+class RosAutoServiceDirective(RosAutoType, RosServiceDirective):
+    """
+    Description of a ROS service type, generated from a ``.srv`` file.
+    """
+
+
+class RosAutoActionDirective(RosAutoType, RosActionDirective):
+    """
+    Description of a ROS action type, generated from an ``.action`` file.
+    """
+
+
+class RosAutoPackageDirective(RosPackageDirective):
+    """
+    Directive describing a package from its ``package.xml`` file, followed by
+    the descriptions of all message, service, and action types found in its
+    ``msg``, ``srv``, and ``action`` directories. The only argument is the
+    path to the package directory, relative to the current document or, if it
+    starts with a slash, to the source directory.
+    """
+
+    final_argument_whitespace = True
+
+    #: package.xml dependency tag -> field label
+    depend_labels = [
+        ('depend', 'Depends'),
+        ('build_depend', 'Build'),
+        ('build_export_depend', 'Build export'),
+        ('buildtool_depend', 'Build tool'),
+        ('exec_depend', 'Execution'),
+        ('run_depend', 'Execution'),
+        ('test_depend', 'Test'),
+        ('doc_depend', 'Documentation'),
+    ]
+
+    #: interface kind -> (rubric, directive name)
+    interface_directives = {
+        'msg': ('Messages', 'ros:automessage'),
+        'srv': ('Services', 'ros:autoservice'),
+        'action': ('Actions', 'ros:autoaction'),
+    }
+
+    def run(self):
+        env = self.state.document.settings.env
+        _, path = env.relfn2path(self.arguments[0])
+        try:
+            info = get_interface_cache(env).scan_package(
+                path, stats=get_build_stats(env))
+        except (IOError, OSError) as exc:
+            return [self.state.document.reporter.warning(
+                'could not read package %r: %s' % (path, exc),
+                line=self.lineno)]
+        except InterfaceParseError as exc:
+            return [self.state.document.reporter.warning(
+                'could not parse package %r: %s' % (path, exc),
+                line=self.lineno)]
+
+        # Re-read the document when the manifest or an interface file
+        # changes. Added or removed interface files are detected by
+        # sphinx_ros.interfaces.find_outdated_docs(), directories can not be
+        # dependencies since Sphinx considers them changed on every build.
+        env.note_dependency(os.path.join(path, 'package.xml'))
+        for _, filename in info.interfaces:
+            env.note_dependency(filename)
+        env.get_domain('ros').note_autopackage(
+            env.docname, os.path.relpath(path, env.srcdir))
+
+        self.arguments = [info.name]
+        if info.deprecated:
+            self.options['deprecated'] = None
+        ret = super(RosAutoPackageDirective, self).run()
+
+        content = StringList()
+        for line in self.package_to_rst(env, info):
+            content.append(line, os.path.join(path, 'package.xml'))
+        node = nodes.Element()
+        self.state.nested_parse(content, self.content_offset, node)
+        ret.extend(node.children)
+        return ret
+
+    def package_to_rst(self, env, info):
+        """
+        Generate the reStructuredText lines describing the package and its
+        interfaces.
+        """
+        if info.description:
+            yield escape_rst(info.description)
+            yield ''
+        if info.version:
+            yield ':Version: ' + escape_rst(info.version)
+        for label, values in [('Maintainer', info.maintainers),
+                              ('Author', info.authors),
+                              ('License', info.licenses)]:
+            if values:
+                yield ':{}: {}'.format(label, escape_rst(', '.join(values)))
+        if info.urls:
+            yield ':Links: ' + ', '.join(
+                '`{} <{}>`__'.format(type_.capitalize(), url)
+                for type_, url in info.urls)
+        for tag, label in self.depend_labels:
+            if tag in info.depends:
+                yield ':{}: {}'.format(label, ', '.join(
+                    ':ros:pkg:`{}`'.format(name)
+                    for name in info.depends[tag]))
+        yield ''
+
+        for kind in interface_kinds:
+            filenames = [filename for kind_, filename in info.interfaces
+                         if kind_ == kind]
+            if not filenames:
+                continue
+            rubric, directive = self.interface_directives[kind]
+            yield '.. rubric:: ' + rubric
+            yield ''
+            for filename in filenames:
+                yield '.. {}:: /{}'.format(
+                    directive, os.path.relpath(filename, env.srcdir))
+                yield '  :package: ' + info.name
+                if 'noindex' in self.options:
+                    yield '  :noindex:'
+                yield ''
@@ -2,19 +2,98 @@
 ``sphinx_ros.domain`` module
 ============================
 
-This module defines the ROS domain. It defines three object types (messages,
-services, and actions) and registers the roles and directives in the Sphinx
-application.
+This module defines the ROS domain. It defines the object types of the ROS
+types (messages, services, and actions) and of the computation graph (nodes,
+topics, parameters, and service servers), and registers the roles and
+directives in the Sphinx application.
 """
 
-from six import iteritems
+import collections
+import re
+
+from six import iteritems, itervalues
 from docutils import nodes
 from sphinx.domains import Domain, ObjType
+from sphinx.util import logging
 from sphinx.util.nodes import make_refnode
 from .xref_role import RosXRefRole
 from .directives import RosPackageDirective, RosCurrentPackageDirective, \
-    RosMessageDirective, RosActionDirective, RosServiceDirective
-from .indices import RosPackageIndex, RosMessageIndex
+    RosMessageDirective, RosActionDirective, RosServiceDirective, \
+    RosAutoMessageDirective, RosAutoServiceDirective, \
+    RosAutoActionDirective, RosAutoPackageDirective, RosSizeTableDirective, \
+    RosTypeFinderDirective, field_fullname
+from .graph import RosNodeDirective, RosTopicDirective, RosParamDirective, \
+    RosServiceServerDirective, graph_labels, graph_relations, graph_key, \
+    resolve_graph_name
+from .indices import RosPackageIndex, RosMessageIndex, RosTopicIndex
+from .interfaces import get_interface_cache, split_array_type, \
+    InterfaceParseError
+from .stats import get_build_stats
+from .typehash import TypeHasher
+from .typesize import TypeSizer
+
+logger = logging.getLogger(__name__)
+
+#: The object a cross-reference resolves to: the document and anchor of a
+#: documented object, or ``None`` and the URI of an external type, which is
+#: ``None`` for installed types, the title of the reference, and the full
+#: names of all the objects matching the reference if it is ambiguous.
+ResolvedXRef = collections.namedtuple(
+    'ResolvedXRef', ['docname', 'target', 'title', 'candidates'])
+
+
+def split_fullname(fullname, objtype):
+    """
+    Split the full name of an object into its package name and short name,
+    e.g. ``'foo_pkg.msg.Foo'`` into ``('foo_pkg', 'Foo')``. The short name of
+    a package is the package name itself.
+    """
+    if objtype == 'package':
+        return fullname, fullname
+    parts = fullname.split('.')
+    return '.'.join(parts[:-2]), parts[-1]
+
+
+def intern_ref(interned, ref):
+    """
+    Return a (package, target, role, searchmode) type lookup whose strings
+    and the lookup itself are shared with the equal ones in ``interned``,
+    adding them if there are none.
+    """
+    ref = tuple(interned.setdefault(x, x) for x in ref)
+    return interned.setdefault(ref, ref)
+
+
+def intern_field(interned, field):
+    """
+    Return a typed doc field, see :meth:`RosDomain.note_fields`, whose
+    strings, type lookup, and the field itself are shared with the equal ones
+    in ``interned``, adding them if there are none.
+    """
+    docfield, name, type_, value, ref = field
+    if ref is not None:
+        ref = intern_ref(interned, ref)
+    field = tuple(interned.setdefault(x, x)
+                  for x in (docfield, name, type_, value)) + (ref,)
+    return interned.setdefault(field, field)
+
+
+def ref_shortname(ref):
+    """
+    Return the short name of the type a lookup refers to, e.g. ``'Foo'`` for
+    the targets ``'Foo[]'``, ``'foo_pkg/Foo'``, and ``'foo_pkg.msg.Foo'``.
+    """
+    return re.split(r'[./]', split_array_type(ref[1])[0])[-1]
+
+
+def index_letter(table, key):
+    """
+    Return the letter under which an entry of the ``packages`` or
+    ``messages`` table is listed in the package or message index.
+    """
+    if table == 'messages':
+        key = split_fullname(key, 'message')[1]
+    return key[0].lower()
 
 
 class RosDomain(Domain):
@@ -26,47 +105,197 @@ class RosDomain(Domain):
     object_types = {
         'message':   ObjType('message', 'msg', 'obj'),
         'service':   ObjType('service', 'srv', 'obj'),
-        'action':    ObjType('action', 'action', 'obj')
+        'action':    ObjType('action', 'action', 'obj'),
+        'field':     ObjType('field'),
+        'constant':  ObjType('constant'),
+        'node':      ObjType('node', 'node'),
+        'topic':     ObjType('topic', 'topic'),
+        'param':     ObjType('parameter', 'param'),
+        'service_server': ObjType('service server', 'service_server')
     }
     roles = {
         'pkg': RosXRefRole(),
         'msg': RosXRefRole(),
         'srv': RosXRefRole(),
-        'act': RosXRefRole()
+        'act': RosXRefRole(),
+        'node': RosXRefRole(),
+        'topic': RosXRefRole(),
+        'param': RosXRefRole(),
+        'service_server': RosXRefRole()
     }
     directives = {
         'package':          RosPackageDirective,
         'currentpackage':   RosCurrentPackageDirective,
         'message':          RosMessageDirective,
         'service':          RosServiceDirective,
-        'action':           RosActionDirective
+        'action':           RosActionDirective,
+        'automessage':      RosAutoMessageDirective,
+        'autoservice':      RosAutoServiceDirective,
+        'autoaction':       RosAutoActionDirective,
+        'autopackage':      RosAutoPackageDirective,
+        'sizetable':        RosSizeTableDirective,
+        'typefinder':       RosTypeFinderDirective,
+        'node':             RosNodeDirective,
+        'topic':            RosTopicDirective,
+        'param':            RosParamDirective,
+        'service_server':   RosServiceServerDirective
     }
+    # The data is pickled with the environment, so it only holds what can
+    # not be derived: the anchors of packages and messages follow from their
+    # names, the secondary indexes of the objects and the index letters are
+    # built from the tables when first needed, and the strings and fields
+    # that repeat are shared, so that they are pickled once. Data of another
+    # version is not migrated, Sphinx reads all documents again instead.
+    data_version = 13
     initial_data = {
         'objects': {},   # fullname -> docname, objtype
-        'packages': {},  # name -> document name, anchor, priority, deprecated
-        'messages': {},  # name -> document name, anchor, priority, deprecated
+        # fullname -> docname, line number of the description of the object,
+        # to report duplicates found when merging parallel reads at
+        'lines': {},
+        'packages': {},  # name -> document name, deprecated
+        'messages': {},  # name -> document name, deprecated
+        'documents': {},    # docname -> set of (table, key)
+        # fullname -> docname, tuple of (doc field, name, type, value, ref)
+        # of the typed doc fields of the object, where ref is the (package,
+        # target, role, searchmode) lookup of a non-primitive type
+        'fields': {},
+        # fullname -> docname, tuple of (field name, first comment line) of
+        # the commented fields and constants, named like field_fullname()
+        'comments': {},
+        # docname -> (docname,) of the documents with a ros:sizetable
+        'sizetables': {},
+        # docname -> docname, tuple of (file name, fullname) of the types
+        # described from interface files, relative to the source directory
+        'sources': {},
+        # docname -> docname, tuple of the directories of the packages
+        # described with ros:autopackage, relative to the source directory
+        'autopackages': {},
+        # docname -> docname, set of (package, target, role, searchmode)
+        # lookups of the references to ROS types made with the roles
+        'typerefs': {},
+        # node name -> docname, tuple of (relation, graph name, type) of the
+        # topics, services, and parameters of the node, see note_graph_links
+        'graphlinks': {},
+        # graph name -> relation -> set of (node name, type), the inverse of
+        # 'graphlinks', and object type -> {(None, '')} for the objects of
+        # the graph described with the directives, see note_object()
+        'graph': {},
+        # table -> letter -> generated index entries
+        'indexcache': {'packages': {}, 'messages': {}},
         'labels': {
             'ros-pkgindex': ('ros-pkgindex', '', 'Package Index'),
-            'ros-msgindex': ('ros-msgindex', '', 'Message Type Index')
+            'ros-msgindex': ('ros-msgindex', '', 'Message Type Index'),
+            'ros-topicindex': ('ros-topicindex', '', 'Topic Index')
         },
         'anonlabels': {
             'ros-pkgindex': ('ros-pkgindex', ''),
-            'ros-msgindex': ('ros-msgindex', '')
+            'ros-msgindex': ('ros-msgindex', ''),
+            'ros-topicindex': ('ros-topicindex', '')
         }
     }
     indices = [
         RosPackageIndex,
         RosMessageIndex,
+        RosTopicIndex,
     ]
 
+    def __init__(self, env):
+        super(RosDomain, self).__init__(env)
+        # (package, target, role, searchmode) -> (matches, external type),
+        # cleared whenever the domain data changes, see _lookup()
+        self._resolve_cache = {}
+        # message fullname -> sorted fullnames of the types using it, see
+        # check_consistency()
+        self._usedby = None
+        # memoized type hashes and sizes, see get_type_hasher() and
+        # get_type_sizer()
+        self._hasher = None
+        self._sizer = None
+        # objects and field type references added or removed while reading
+        self._changed_objects = set()
+        self._changed_refs = set()
+        # fullname -> (docname, objtype) before reading, or None, of the
+        # objects added or removed while reading
+        self._old_objects = {}
+        # external types that changed since the previous build, see
+        # note_external_changes()
+        self._changed_external = set()
+        # short name -> set of fullnames and package name -> set of
+        # fullnames, see _get_secondary_indexes()
+        self._shortnames = None
+        self._pkgobjects = None
+        # table -> letter -> set of keys, see _get_index_letters()
+        self._indexletters = None
+        # the strings and fields added to the data in this build, see
+        # _intern(); the ones of the documents that were not read again are
+        # already shared since they were pickled together
+        self._interned = {}
+
+    @staticmethod
+    def package_anchor(name):
+        """
+        Returns the anchor of the description of a package.
+        """
+        return 'ros-pkg-{}'.format(name)
+
     def clear_doc(self, docname):
-        for fullname, (fn, _l) in list(self.data['objects'].items()):
-            if fn == docname:
-                del self.data['objects'][fullname]
-        # name -> document name, anchor, priority, deprecated
-        for pkgname, (fn, _, _, _) in list(self.data['packages'].items()):
-            if fn == docname:
-                del self.data['packages'][pkgname]
+        # Only look at the entries added by the document, an entry may have
+        # been replaced by a duplicate description in another document since.
+        for table, key in self.data['documents'].pop(docname, ()):
+            entry = self.data[table].get(key)
+            if entry is None or entry[0] != docname:
+                continue
+            if table == 'objects':
+                self._remove_object(key)
+            elif table == 'fields':
+                self._note_changed_fields(key, self.data['fields'].pop(key)[1])
+                self._data_changed()
+            elif table in ('lines', 'comments', 'sizetables', 'sources',
+                           'autopackages', 'typerefs'):
+                del self.data[table][key]
+            elif table == 'graphlinks':
+                self._remove_graph_links(key)
+            else:
+                self._remove_index_entry(table, key)
+
+    def merge_domaindata(self, docnames, otherdata):
+        """
+        Merge the domain data collected by a parallel reader process for the
+        documents in ``docnames`` into this domain's data.
+        """
+        for docname in docnames:
+            for table, key in otherdata['documents'].get(docname, ()):
+                entry = otherdata[table].get(key)
+                if entry is None or entry[0] != docname:
+                    continue
+                if table == 'objects':
+                    line = otherdata['lines'].get(key)
+                    location = docname
+                    if line is not None and line[0] == docname:
+                        location = line
+                    self.note_object(key, entry[1], docname,
+                                     location=location)
+                elif table == 'lines':
+                    pass  # merged with the object
+                elif table == 'fields':
+                    self.note_fields(key, entry[1], docname)
+                elif table == 'comments':
+                    self.note_field_comments(key, entry[1], docname)
+                elif table == 'sizetables':
+                    self.note_size_table(docname)
+                elif table == 'sources':
+                    for filename, fullname in entry[1]:
+                        self.note_source(docname, filename, fullname)
+                elif table == 'autopackages':
+                    for path in entry[1]:
+                        self.note_autopackage(docname, path)
+                elif table == 'typerefs':
+                    for ref in entry[1]:
+                        self.note_type_ref(docname, ref)
+                elif table == 'graphlinks':
+                    self.note_graph_links(key, entry[1], docname)
+                else:
+                    self._set_index_entry(table, key, entry)
 
     def find_obj(self, env, pkgname, name, type, searchmode=0):
         """
@@ -84,9 +313,14 @@ class RosDomain(Domain):
         newname = None
         if searchmode == 1:
             if type is None:
-                objtypes = list(self.object_types)
+                objtypes = list(self.object_types) + ['package']
+            elif type == 'pkg':
+                objtypes = ['package']
             else:
                 objtypes = self.objtypes_for_role(type)
+            matches = [(fullname, objects[fullname]) for fullname in
+                       self._find_specific(pkgname, name)
+                       if objects[fullname][1] in objtypes]
         else:
             # NOTE: searching for exact match, object type is not considered
             if name in objects:
@@ -101,36 +335,249 @@ class RosDomain(Domain):
             matches.append((newname, objects[newname]))
         return matches
 
+    def _find_specific(self, pkgname, name):
+        """
+        Return the sorted full names of the objects matching ``name`` by short
+        name and, if given, by package and object type prefix, e.g. ``Foo``,
+        ``foo_pkg/Foo``, ``msg.Foo``, or ``foo_pkg.msg.Foo``. If more than one
+        object matches and some of them are in package ``pkgname``, only those
+        are returned.
+        """
+        shortnames, pkgobjects = self._get_secondary_indexes()
+        parts = name.replace('/', '.').split('.')
+        shortname, qualifier = parts[-1], parts[:-1]
+        candidates = shortnames.get(shortname, set())
+
+        obj_type_prefix = None
+        if qualifier and qualifier[-1] in ('msg', 'srv', 'action'):
+            obj_type_prefix = qualifier.pop()
+        if qualifier:
+            candidates = candidates & pkgobjects.get('.'.join(qualifier),
+                                                     set())
+        if obj_type_prefix is not None:
+            candidates = [fullname for fullname in candidates
+                          if fullname.split('.')[-2:-1] == [obj_type_prefix]]
+
+        if len(candidates) > 1 and not qualifier and pkgname:
+            in_package = pkgobjects.get(pkgname, set())
+            if in_package & set(candidates):
+                candidates = in_package & set(candidates)
+        return sorted(candidates)
+
     def resolve_xref(self, env, fromdocname, builder, type, target, node,
                      contnode):
-        pkgname = node.get('ros:package')
+        stats = get_build_stats(env)
+        if stats is not None:
+            stats.count('resolve_xref')
+        key = self.xref_key(node)
+        resolved = self.resolve_xref_key(env, key)
+        if resolved is None:
+            self._note_unresolved(env, key, node)
+            return None
+        return self.make_xref_node(
+            resolved, node, contnode,
+            self.xref_attributes(builder, fromdocname, resolved))
+
+    def xref_key(self, node):
+        """
+        Returns what the resolution of a ROS cross-reference depends on: its
+        type, target, package, search mode and, for the objects of the
+        computation graph, the node it was made in. References with the same
+        key resolve to the same object.
+
+        :rtype: tuple
+        """
+        type = node['reftype']
         searchmode = node.hasattr('refspecific') and 1 or 0
+        ros_node = type in graph_labels and node.get('ros:node') or None
+        return (type, node['reftarget'], node.get('ros:package'), searchmode,
+                ros_node)
 
-        matches = self.find_obj(env, pkgname, target, type, searchmode)
+    def resolve_xref_key(self, env, key):
+        """
+        Resolves a cross-reference given by its xref_key().
+
+        :return: The object, or ``None`` if the reference can not be resolved.
+        :rtype: ResolvedXRef
+        """
+        type, target, pkgname, searchmode, ros_node = key
+        if type in graph_labels:
+            name = resolve_graph_name(target, ros_node)
+            key = graph_key(type, name)
+            obj = self.data['objects'].get(key)
+            if obj is None or obj[1] != type:
+                return self._find_graph_node(type, name)
+            return ResolvedXRef(obj[0], key, name, ())
 
+        matches, external = self._lookup(env, pkgname, target, type,
+                                         searchmode)
         if not matches:
-            return None
-        elif len(matches) > 1:
-            env.warn_node(
-                'more than one target found for cross-reference '
-                '%r: %s' % (target, ', '.join(match[0] for match in matches)),
-                node)
+            if not external:
+                return None
+            _, uri, title = external
+            return ResolvedXRef(None, uri, title, ())
         name, obj = matches[0]
-
+        candidates = len(matches) > 1 and \
+            tuple(match[0] for match in matches) or ()
         if obj[1] == 'package':
-            return self._make_package_refnode(builder, fromdocname, name,
-                                              contnode)
+            docname, deprecated = self.data['packages'][name]
+            return ResolvedXRef(docname, self.package_anchor(name),
+                                deprecated and name + ' (deprecated)' or name,
+                                candidates)
+        return ResolvedXRef(obj[0], name, name, candidates)
+
+    def _find_graph_node(self, type, name):
+        """
+        Resolves a reference to a graph name that is not described with a
+        directive, e.g. a topic only given in the doc fields of nodes, to the
+        first node related to it, publishers before subscribers.
+
+        :rtype: ResolvedXRef
+        """
+        links = self.data['graph'].get(name, {})
+        objects = self.data['objects']
+        for relation in graph_relations.get(type, ()):
+            for node, _ in sorted(links.get(relation, ())):
+                key = graph_key('node', node)
+                if key in objects:
+                    return ResolvedXRef(objects[key][0], key, name, ())
+        return None
+
+    def xref_attributes(self, builder, fromdocname, resolved):
+        """
+        Returns the attributes of the reference node of a cross-reference
+        resolved by resolve_xref_key(), like make_refnode() sets them. They
+        are the same for all the references to an object from a document.
+
+        :param resolved: The object referenced
+        :type resolved: ResolvedXRef
+        :return: The attributes, or ``None`` if the object is not linked.
+        :rtype: dict
+        """
+        if resolved.docname is None:
+            if resolved.target is None:
+                return None  # an installed type, which is not linked
+            return {'internal': False, 'refuri': resolved.target,
+                    'reftitle': resolved.title}
+        attributes = {'internal': True, 'reftitle': resolved.title}
+        if resolved.docname == fromdocname:
+            attributes['refid'] = resolved.target
         else:
-            return make_refnode(builder, fromdocname, obj[0], name, contnode,
-                                name)
+            attributes['refuri'] = builder.get_relative_uri(
+                fromdocname, resolved.docname) + '#' + resolved.target
+        return attributes
+
+    def make_xref_node(self, resolved, node, contnode, attributes):
+        """
+        Makes the node replacing a cross-reference resolved by
+        resolve_xref_key(), warning if the reference is ambiguous.
+
+        :param resolved: The object referenced
+        :type resolved: ResolvedXRef
+        :param dict attributes: The attributes of the reference node, see
+                                xref_attributes()
+        """
+        if resolved.candidates:
+            logger.warning(
+                'more than one target found for cross-reference '
+                '%r: %s' % (node['reftarget'], ', '.join(resolved.candidates)),
+                location=node)
+        if attributes is None:
+            return contnode
+        newnode = nodes.reference('', '', **attributes)
+        newnode.append(contnode)
+        return newnode
+
+    def _note_unresolved(self, env, key, node):
+        """
+        Warns about a reference to an unknown type if any inventories are
+        configured, and records the unresolved reference in the statistics.
+        The types of the doc fields are not warned about here, since they are
+        reported at once by get_unresolved_field_types().
+        """
+        type, target, pkgname, searchmode, _ = key
+        if type in graph_labels:
+            return
+        base, _ = split_array_type(target)
+        if base in RosXRefRole.ros_msg_primitives:
+            return
+        _, external = self._lookup(env, pkgname, target, type, searchmode)
+        if external is False and type != 'pkg' and \
+                not node.get('ros:fieldtype') and \
+                ('/' in base or '.' in base or base == 'Header'):
+            logger.warning('unknown ROS type %r', target, location=node)
+        stats = get_build_stats(env)
+        if stats is not None:
+            stats.note_unresolved(target)
+
+    def _lookup(self, env, pkgname, target, type, searchmode):
+        """
+        Find the objects matching a cross-reference with find_obj() and, if
+        there are none, the external type with _find_external(). The results
+        are cached until the domain data changes, since the same types are
+        usually referenced many times.
+
+        :return: The matches of find_obj() and the external type.
+        :rtype: tuple
+        """
+        key = (pkgname, target, type, searchmode)
+        stats = get_build_stats(env)
+        try:
+            result = self._resolve_cache[key]
+        except KeyError:
+            matches = self.find_obj(env, pkgname, target, type, searchmode)
+            external = None
+            if not matches:
+                external = self._find_external(env, type, target)
+            result = self._resolve_cache[key] = (matches, external)
+            if stats is not None:
+                stats.count('resolve_cache_misses')
+        else:
+            if stats is not None:
+                stats.count('resolve_cache_hits')
+        return result
+
+    def _find_external(self, env, type, target):
+        """
+        Find a type that is not documented in this project in the inventories
+        of :confval:`ros_type_inventories` or, if
+        :confval:`ros_system_interfaces` is set, in the installed packages.
+
+        :return: The full name, URI and title of the type, ``None`` if no
+                 inventories are configured or the target is a primitive
+                 type, or ``False`` if the type is unknown.
+        """
+        inventories = [getattr(env, 'ros_system_interfaces', None)]
+        if env.config.ros_type_inventories:
+            inventories.insert(0, getattr(env, 'ros_type_inventory', None))
+        inventories = [inventory for inventory in inventories
+                       if inventory is not None]
+        if not inventories:
+            return None
+        base, _ = split_array_type(target)
+        if base in RosXRefRole.ros_msg_primitives:
+            return None
+        for inventory in inventories:
+            external = inventory.lookup(base, type)
+            if external is not None:
+                return external
+        return False
 
     def resolve_any_xref(self, env, fromdocname, builder, target, node,
                          contnode):
         pkgname = node.get('ros:package')
         results = []
 
+        for type in sorted(graph_labels):
+            resolved = self.resolve_xref_key(
+                env, (type, target, pkgname, 0, node.get('ros:node')))
+            if resolved is not None:
+                results.append(('ros:' + type, self.make_xref_node(
+                    resolved, node, contnode,
+                    self.xref_attributes(builder, fromdocname, resolved))))
+
         # Always search in 'refspecific' mode with the :any: role
-        matches = self.find_obj(env, pkgname, target, None, 1)
+        matches, _ = self._lookup(env, pkgname, target, None, 1)
         for name, obj in matches:
             if obj[1] == 'package':
                 results.append(('ros:pkg',
@@ -145,22 +592,49 @@ class RosDomain(Domain):
 
     def _make_package_refnode(self, builder, fromdocname, name, contnode):
         # Get additional info for packages
-        # name -> document name, anchor, priority, deprecated
-        docname, anchor, _, deprecated = self.data['packages'][name]
+        # name -> document name, deprecated
+        docname, deprecated = self.data['packages'][name]
         title = name
         if deprecated:
             title += ' (deprecated)'
-        return make_refnode(builder, fromdocname, docname, anchor, contnode,
-                            title)
+        return make_refnode(builder, fromdocname, docname,
+                            self.package_anchor(name), contnode, title)
 
     def get_objects(self):
-        for pkgname, info in iteritems(self.data['packages']):
-            yield (pkgname, pkgname, 'package', info[0],
-                   'package-' + pkgname, 0)
-        for refname, (docname, type) in iteritems(self.data['objects']):
-            if type != 'package':
+        objects = self.data['objects']
+        for pkgname, (docname, _) in iteritems(self.data['packages']):
+            yield (pkgname, pkgname, 'package', docname,
+                   self.package_anchor(pkgname), 0)
+        for refname, (docname, type) in iteritems(objects):
+            if type in graph_labels:
+                # listed by graph name, which is unique per object type
+                name = refname[len(type):]
+                yield (name, name, type, docname, refname, 1)
+            elif type != 'package':
                 yield (refname, refname, type, docname, refname, 1)
 
+    def get_field_objects(self):
+        """
+        Return an iterator of the fields and constants of the documented
+        types for the HTML search index, as (name, type, docname, field
+        type, comment) tuples. They are not returned by get_objects(), which
+        would also write them to ``objects.inv``, see
+        :class:`sphinx_ros.search.RosIndexBuilder`.
+        """
+        objects = self.data['objects']
+        comments = self.data['comments']
+        for refname, (docname, fields) in iteritems(self.data['fields']):
+            if refname not in objects or objects[refname][0] != docname:
+                continue
+            entry = comments.get(refname)
+            described = dict(entry[1] if entry and entry[0] == docname
+                             else ())
+            for docfield, name, type_, _, _ in fields:
+                type = docfield.endswith('constant') and 'constant' or 'field'
+                fieldname = field_fullname(refname, docfield, name)
+                yield (fieldname, type, docname, type_,
+                       described.get(fieldname, ''))
+
     def add_package(self, name, deprecated):
         """
         Adds a package to the domain data.
@@ -170,16 +644,651 @@ class RosDomain(Domain):
         :return: The unique anchor of the package.
         :rtype: str
         """
-        anchor = 'ros-pkg-{}'.format(name)
-        # name -> document name, anchor, priority, deprecated
-        self.data['packages'][name] = (self.env.docname, anchor, 0, deprecated)
+        # name -> document name, deprecated
+        self._set_index_entry('packages', name,
+                              (self.env.docname, deprecated))
         # make a duplicate entry in 'objects' to facilitate searching for the
         # package in RosDomain.find_obj()
-        self.data['objects'][name] = (self.env.docname, 'package')
-        return anchor
+        self.note_object(name, 'package', self.env.docname)
+        return self.package_anchor(name)
 
-    def add_message(self, name, deprecated):
-        # name -> document name, anchor, priority, deprecated
-        self.data['messages'][name] = (self.env.docname, name, 0, deprecated)
-        self.data['objects'][name] = (self.env.docname, 'message')
+    def note_object(self, fullname, objtype, docname, location=None):
+        """
+        Adds an object to the ``objects`` table of the domain data, warning
+        when it was already described in another document.
+
+        :param str fullname: The full name of the object
+        :param str objtype: The object type, e.g. ``'message'``
+        :param str docname: The document describing the object
+        :param location: The location to report a duplicate description at,
+                         the line number of a (docname, line number) tuple
+                         is kept for merge_domaindata()
+        """
+        objects = self.data['objects']
+        fullname = self._intern(fullname)
+        # packages are not checked for duplicates, see add_package()
+        if objtype != 'package' and fullname in objects:
+            if objtype in graph_labels:
+                description = '{} {}'.format(graph_labels[objtype],
+                                             fullname[len(objtype):])
+            else:
+                description = fullname
+            logger.warning(
+                'duplicate object description of %s, ' % description +
+                'other instance in ' +
+                self.env.doc2path(objects[fullname][0]) +
+                ', use :noindex: for one of them',
+                location=location)
+        if fullname in objects:
+            self._remove_object(fullname)
+        else:
+            self._old_objects.setdefault(fullname, None)
+        objects[fullname] = (docname, objtype)
+        self._changed_objects.add(fullname)
+        self._data_changed()
+
+        if objtype in graph_labels:
+            self.data['graph'].setdefault(
+                fullname[len(objtype):], {})[objtype] = set([(None, '')])
+        if self._shortnames is not None:
+            self._add_secondary_entries(fullname, objtype)
+        self._note_entry('objects', fullname, docname)
+        if isinstance(location, tuple) and location[1] is not None:
+            self.data['lines'][fullname] = (docname, location[1])
+            self._note_entry('lines', fullname, docname)
+
+    def _get_secondary_indexes(self):
+        """
+        Returns the secondary indexes of the ``objects`` table used by
+        find_obj() for 'refspecific' searches, building them if needed.
+
+        :return: The dictionaries short name -> set of fullnames and package
+                 name -> set of fullnames.
+        :rtype: tuple
+        """
+        if self._shortnames is None:
+            self._shortnames = {}
+            self._pkgobjects = {}
+            for fullname, (_, objtype) in iteritems(self.data['objects']):
+                self._add_secondary_entries(fullname, objtype)
+        return self._shortnames, self._pkgobjects
+
+    def _add_secondary_entries(self, fullname, objtype):
+        if objtype in graph_labels:
+            return  # found by graph name, see resolve_xref_key()
+        pkgname, shortname = split_fullname(fullname, objtype)
+        self._shortnames.setdefault(shortname, set()).add(fullname)
+        self._pkgobjects.setdefault(pkgname, set()).add(fullname)
+
+    def note_fields(self, fullname, fields, docname):
+        """
+        Records the typed doc fields of an object, which define the type
+        dependency graph and the type hashes, see check_consistency().
+
+        :param str fullname: The full name of the object
+        :param fields: The fields, as (doc field, name, type, value, ref)
+                       tuples, where ``ref`` is the (package, target, role,
+                       searchmode) lookup of the type like the ones
+                       resolve_xref() looks up, or ``None`` for primitive
+                       types.
+        :param str docname: The document describing the object
+        """
+        fullname = self._intern(fullname)
+        fields = tuple(intern_field(self._interned, field)
+                       for field in fields)
+        entry = self.data['fields'].get(fullname)
+        if entry is not None and entry[0] == docname:
+            fields = entry[1] + fields
+        self.data['fields'][fullname] = (docname, fields)
+        self._note_changed_fields(fullname, fields)
+        self._note_entry('fields', fullname, docname)
+        self._data_changed()
+
+    def note_field_comments(self, fullname, comments, docname):
+        """
+        Records the first comment lines of the fields and constants of an
+        object, which are shown in the search results, see
+        get_field_objects().
+
+        :param str fullname: The full name of the object
+        :param comments: The comments, as (field name, comment) tuples with
+                         the field names of
+                         :func:`sphinx_ros.directives.field_fullname`
+        :param str docname: The document describing the object
+        """
+        comments = tuple(comments)
+        entry = self.data['comments'].get(fullname)
+        if entry is not None and entry[0] == docname:
+            comments = entry[1] + comments
+        self.data['comments'][fullname] = (docname, comments)
+        self._note_entry('comments', fullname, docname)
+
+    def _note_changed_fields(self, fullname, fields):
+        self._changed_objects.add(fullname)
+        self._changed_refs.update(field[4] for field in fields if field[4])
+
+    def resolve_field_type(self, ref):
+        """
+        Returns the message type referenced by the type of a field.
+
+        :param tuple ref: The lookup of the type, see note_fields()
+        :return: The full name of the message type, or ``None``.
+        :rtype: str
+        """
+        if ref is None:
+            return None
+        matches, external = self._lookup(self.env, *ref)
+        if matches:
+            return matches[0][1][1] == 'message' and matches[0][0] or None
+        if external and self._get_installed_file(external[0]) is not None:
+            return external[0]
+        return None
+
+    def get_message_definition(self, fullname):
+        """
+        Returns the definition of a documented message type or, if
+        :confval:`ros_system_interfaces` is set, of an installed message type.
+
+        :param str fullname: The full name of the message type
+        :return: The constants, as (type, name, value) tuples, and the
+                 fields, as (type, name, ref) tuples, or ``None`` if the
+                 message type is neither documented nor installed, or if it
+                 is described without doc fields and not from an interface
+                 file, so that its definition is not known.
+        :rtype: tuple
+        """
+        objects = self.data['objects']
+        if fullname not in objects:
+            return self._get_installed_definition(fullname)
+        if objects[fullname][1] != 'message':
+            return None
+        docname = objects[fullname][0]
+        entry = self.data['fields'].get(fullname)
+        if entry is None or entry[0] != docname:
+            # Only a type described from an interface file is known to be
+            # empty
+            if any(name == fullname for _, name in self.get_sources(docname)):
+                return [], []
+            return None
+        constants = [(type_, name, value) for docfield, name, type_, value, _
+                     in entry[1] if docfield == 'constant']
+        fields = [(type_, name, ref) for docfield, name, type_, _, ref
+                  in entry[1] if docfield == 'parameter']
+        return constants, fields
+
+    def _get_installed_file(self, fullname):
+        """
+        Returns the interface file of an installed message type, or ``None``.
+        """
+        installed = getattr(self.env, 'ros_system_interfaces', None)
+        if installed is None or fullname not in installed.files or \
+                fullname.split('.')[-2] != 'msg':
+            return None
+        return installed.files[fullname][0]
+
+    def _get_installed_definition(self, fullname):
+        """
+        Returns the definition of an installed message type, parsed with the
+        interface cache, in the format of get_message_definition().
+        """
+        filename = self._get_installed_file(fullname)
+        if filename is None:
+            return None
+        try:
+            interface = get_interface_cache(self.env).parse(
+                filename, stats=get_build_stats(self.env))
+        except (IOError, OSError, InterfaceParseError, UnicodeError) as exc:
+            logger.verbose('failed to parse installed ROS type %s: %s',
+                           fullname, exc)
+            return None
+        pkgname = split_fullname(fullname, 'message')[0]
+        section = interface.sections[0]
+        constants = [(const.type, const.name, const.value)
+                     for const in section.constants]
+        fields = []
+        for field in section.fields:
+            base = split_array_type(field.type)[0]
+            ref = None
+            if base not in RosXRefRole.ros_msg_primitives:
+                if base == 'Header':
+                    base = 'std_msgs/Header'
+                elif '/' not in base:
+                    base = pkgname + '/' + base
+                ref = (None, base, 'msg', 1)
+            fields.append((field.type, field.name, ref))
+        return constants, fields
+
+    def note_external_changes(self, fullnames):
+        """
+        Records that types that are not documented in the project, e.g.
+        installed types, were added, removed, or modified, so that
+        get_changed_docs() returns the documents referencing them and, if
+        type hashes or sizes are shown, the documents of the types using
+        them.
+
+        :param fullnames: The full names of the types
+        """
+        fullnames = set(fullnames)
+        if fullnames:
+            self._changed_objects.update(fullnames)
+            self._changed_external.update(fullnames)
+            self._data_changed()
+
+    def get_type_hasher(self):
+        """
+        Returns the memoized hashes of the message types, which are kept
+        until the domain data changes.
+
+        :rtype: sphinx_ros.typehash.TypeHasher
+        """
+        if self._hasher is None:
+            self._hasher = TypeHasher(self)
+        return self._hasher
+
+    def get_type_sizer(self):
+        """
+        Returns the memoized serialized sizes of the message types, which are
+        kept until the domain data changes.
+
+        :rtype: sphinx_ros.typesize.TypeSizer
+        """
+        if self._sizer is None:
+            self._sizer = TypeSizer(self)
+        return self._sizer
+
+    def note_size_table(self, docname):
+        """
+        Records that a document has a table of the sizes of all message
+        types, which is written again whenever the message types change.
+        """
+        self.data['sizetables'][docname] = (docname,)
+        self._note_entry('sizetables', docname, docname)
+
+    def note_source(self, docname, filename, fullname):
+        """
+        Records that a document describes a type from an interface file, so
+        that the documents referencing the type are read again when the
+        contents of the file change, see get_referencing_docs().
+
+        :param str docname: The document describing the type
+        :param str filename: The interface file, relative to the source
+                             directory
+        :param str fullname: The full name of the type
+        """
+        entry = self.data['sources'].get(docname, (docname, ()))
+        self.data['sources'][docname] = (
+            docname, entry[1] + ((filename, self._intern(fullname)),))
+        self._note_entry('sources', docname, docname)
+
+    def get_sources(self, docname):
+        """
+        Returns the types a document describes from interface files.
+
+        :return: A tuple of (file name, fullname) tuples.
+        :rtype: tuple
+        """
+        return self.data['sources'].get(docname, (docname, ()))[1]
+
+    def note_autopackage(self, docname, path):
+        """
+        Records that a document describes a package with ros:autopackage, so
+        that the document is read again when interface files are added to or
+        removed from the package, see
+        sphinx_ros.interfaces.find_outdated_docs().
+
+        :param str docname: The document describing the package
+        :param str path: The package directory, relative to the source
+                         directory
+        """
+        entry = self.data['autopackages'].get(docname, (docname, ()))
+        if path not in entry[1]:
+            self.data['autopackages'][docname] = (docname,
+                                                  entry[1] + (path,))
+        self._note_entry('autopackages', docname, docname)
+
+    def get_autopackages(self):
+        """
+        Returns the documents describing packages with ros:autopackage.
+
+        :return: An iterator of (docname, tuple of package directories)
+                 tuples.
+        """
+        for docname, paths in self.data['autopackages'].values():
+            yield docname, paths
+
+    def note_type_ref(self, docname, ref):
+        """
+        Records a reference to a ROS type made with a role, see
+        get_referencing_docs(). References made with the doc fields are
+        recorded by note_fields().
+
+        :param str docname: The document with the reference
+        :param tuple ref: The (package, target, role, searchmode) lookup of
+                          the type like the ones resolve_xref() looks up
+        """
+        entry = self.data['typerefs'].get(docname)
+        if entry is None:
+            entry = self.data['typerefs'][docname] = (docname, set())
+        entry[1].add(intern_ref(self._interned, ref))
+        self._note_entry('typerefs', docname, docname)
+
+    def get_referencing_docs(self, fullnames):
+        """
+        Returns the documents with references, made with the roles or the
+        doc fields, that may refer to one of the given types. The references
+        are matched by the short name of the type, so that references to
+        types that were removed are found as well.
+
+        :param fullnames: The full names of the types
+        :rtype: set
+        """
+        shortnames = set(split_fullname(fullname, 'message')[1]
+                         for fullname in fullnames)
+        docnames = set()
+        for docname, refs in itervalues(self.data['typerefs']):
+            if any(ref_shortname(ref) in shortnames for ref in refs):
+                docnames.add(docname)
+        for docname, fields in itervalues(self.data['fields']):
+            if docname not in docnames and \
+                    any(field[4] and ref_shortname(field[4]) in shortnames
+                        for field in fields):
+                docnames.add(docname)
+        return docnames
+
+    def note_graph_links(self, node, links, docname):
+        """
+        Records the topics a node publishes and subscribes to, the services
+        it provides, and the parameters it reads, and adds the node to the
+        inverted map of these graph names, which the topic index lists.
+
+        :param str node: The graph name of the node
+        :param links: The (relation, graph name, type) tuples, where the
+                      relation is the doc field, e.g. ``'publisher'``.
+        :param str docname: The document describing the node
+        """
+        node = self._intern(node)
+        links = tuple(tuple(self._intern(x) for x in link) for link in links)
+        entry = self.data['graphlinks'].get(node)
+        if entry is not None and entry[0] != docname:
+            self._remove_graph_links(node)
+            entry = None
+        self.data['graphlinks'][node] = (docname, (entry and entry[1] or ()) +
+                                         links)
+        graph = self.data['graph']
+        for relation, name, type_ in links:
+            graph.setdefault(name, {}).setdefault(relation, set()).add(
+                (node, type_))
+        self._note_entry('graphlinks', node, docname)
+
+    def _remove_graph_links(self, node):
+        _, links = self.data['graphlinks'].pop(node)
+        for relation, name, type_ in links:
+            self._remove_graph_entry(name, relation, (node, type_))
+
+    def _remove_graph_entry(self, name, relation, link=(None, '')):
+        graph = self.data['graph']
+        nodes_ = graph[name][relation]
+        nodes_.discard(link)
+        if not nodes_:
+            del graph[name][relation]
+            if not graph[name]:
+                del graph[name]
+
+    def get_graph_links(self, name):
+        """
+        Returns the nodes related to a graph name, e.g. the publishers and
+        subscribers of a topic.
+
+        :param str name: The graph name
+        :return: A dictionary of relation -> set of (node name, type).
+        :rtype: dict
+        """
+        return self.data['graph'].get(name, {})
+
+    def get_unresolved_field_types(self):
+        """
+        Looks up the types of the fields of all objects, every distinct
+        type once, and returns the ones that are neither documented in the
+        project nor found in the type inventories or the installed packages.
+        Without either, the types of the packages linked to the API
+        documentation of ROS, see RosXRefRole, are considered resolved.
+
+        :return: A dictionary of package name -> field type -> set of the
+                 documents using the type in the package.
+        :rtype: dict
+        """
+        # (package, target, role, searchmode) -> {(package, type, docname)}
+        refs = {}
+        for fullname, (docname, fields) in iteritems(self.data['fields']):
+            pkgname = split_fullname(fullname, 'message')[0]
+            for _, _, type_, _, ref in fields:
+                if ref is not None:
+                    refs.setdefault(ref, set()).add(
+                        (pkgname, split_array_type(type_)[0], docname))
+
+        config = self.env.config
+        legacy = not config.ros_type_inventories and \
+            not config.ros_system_interfaces
+        unresolved = {}
+        for ref, uses in iteritems(refs):
+            matches, external = self._lookup(self.env, *ref)
+            if matches or external:
+                continue
+            if legacy and (ref[1] == 'Header' or re.split(r'[./]', ref[1])[0]
+                           in RosXRefRole.ros_api_pkgs):
+                continue
+            for pkgname, type_, docname in uses:
+                unresolved.setdefault(pkgname, {}).setdefault(
+                    type_, set()).add(docname)
+        return unresolved
+
+    def check_consistency(self):
+        """
+        Builds the type dependency graph from the field types of all
+        objects, once per build after all documents are read.
+        """
+        self.get_usedby(None)
+
+    def get_usedby(self, fullname):
+        """
+        Returns the types that have fields of the given message type.
+
+        :param str fullname: The full name of the message type
+        :return: The full names of the using types, sorted.
+        :rtype: list
+        """
+        if self._usedby is None:
+            objects = self.data['objects']
+            usedby = {}
+            for user, (docname, fields) in iteritems(self.data['fields']):
+                if user not in objects or objects[user][0] != docname:
+                    continue  # not indexed or described again elsewhere
+                for ref in set(field[4] for field in fields if field[4]):
+                    name = self.resolve_field_type(ref)
+                    if name is not None and name != user:
+                        usedby.setdefault(name, set()).add(user)
+            self._usedby = dict((name, sorted(users))
+                                for name, users in iteritems(usedby))
+        return self._usedby.get(fullname, [])
+
+    def get_changed_docs(self):
+        """
+        Returns the documents describing message types whose users changed
+        while reading and, if type hashes or sizes are shown, whose nested
+        types changed, the documents with size tables if any type changed,
+        and the documents referencing types that were added, removed, or
+        moved to another document, whose links would be out of date
+        otherwise, or external types that changed. The changes are reset.
+
+        :rtype: set
+        """
+        changed = set(self._changed_objects)
+        for ref in self._changed_refs:
+            name = self.resolve_field_type(ref)
+            if name is not None:
+                changed.add(name)
+        config = self.env.config
+        if config.ros_type_hashes or config.ros_message_sizes:
+            pending = list(changed)
+            while pending:
+                for user in self.get_usedby(pending.pop()):
+                    if user not in changed:
+                        changed.add(user)
+                        pending.append(user)
+        self._changed_objects = set()
+        self._changed_refs = set()
+
+        objects = self.data['objects']
+        docnames = set(objects[name][0] for name in changed if name in objects)
+        if changed:
+            docnames.update(self.data['sizetables'])
+        relinked = [name for name, entry in iteritems(self._old_objects)
+                    if objects.get(name) != entry]
+        relinked.extend(self._changed_external)
+        self._old_objects = {}
+        self._changed_external = set()
+        if relinked:
+            docnames.update(self.get_referencing_docs(relinked))
+        return docnames
+
+    def _intern(self, value):
+        """
+        Returns the equal string added to the domain data before, if any, so
+        that the pickled data stores it once.
+        """
+        return self._interned.setdefault(value, value)
+
+    def _data_changed(self):
+        """
+        Drops the lookups, the type dependency graph, and the type hashes and
+        sizes that are derived from the domain data.
+        """
+        self._resolve_cache.clear()
+        self._usedby = None
+        self._hasher = None
+        self._sizer = None
+
+    def _note_entry(self, table, key, docname):
+        """
+        Records that ``docname`` added ``key`` to ``table`` of the domain data,
+        so that clear_doc() and merge_domaindata() only need to look at the
+        entries of the documents concerned.
+        """
+        self.data['documents'].setdefault(docname, set()).add((table, key))
+
+    def _set_index_entry(self, table, key, entry):
+        """
+        Sets an entry of the ``packages`` or ``messages`` table of the domain
+        data, and invalidates the cached index entries of its letter.
+        """
+        key = self._intern(key)
+        if key in self.data[table]:
+            self._remove_index_entry(table, key)
+        self.data[table][key] = entry
+        self._data_changed()
+        letter = index_letter(table, key)
+        if self._indexletters is not None:
+            self._indexletters[table].setdefault(letter, set()).add(key)
+        self.data['indexcache'][table].pop(letter, None)
+        self._note_entry(table, key, entry[0])
+
+    def _remove_index_entry(self, table, key):
+        """
+        Removes an entry of the ``packages`` or ``messages`` table of the
+        domain data, and invalidates the cached index entries of its letter.
+        """
+        del self.data[table][key]
+        self._data_changed()
+        letter = index_letter(table, key)
+        if self._indexletters is not None:
+            letters = self._indexletters[table]
+            letters[letter].discard(key)
+            if not letters[letter]:
+                del letters[letter]
+        self.data['indexcache'][table].pop(letter, None)
+
+    def _get_index_letters(self, table):
+        """
+        Returns the keys of the ``packages`` or ``messages`` table by index
+        letter, building them if needed.
+
+        :rtype: dict
+        """
+        if self._indexletters is None:
+            self._indexletters = {}
+            for name in ('packages', 'messages'):
+                letters = self._indexletters[name] = {}
+                for key in self.data[name]:
+                    letters.setdefault(index_letter(name, key),
+                                       set()).add(key)
+        return self._indexletters[table]
+
+    def get_index_content(self, index):
+        """
+        Returns the content of a package or message index, sorted by letter.
+        Only the letters whose entries changed since the index was last
+        generated are generated again.
+
+        :param index: The index, which defines the table of the domain data
+                      it lists and how its entries are generated.
+        :type index: RosPackageIndex or RosMessageIndex
+        :return: A list of (letter, entries) tuples.
+        :rtype: list
+        """
+        return list(self.iter_index_content(index))
+
+    def iter_index_content(self, index):
+        """
+        Generates the content of a package or message index letter by letter,
+        like get_index_content(), so that the letters can be written one at
+        a time.
+        """
+        letters = self._get_index_letters(index.table)
+        cache = self.data['indexcache'][index.table]
+        stats = get_build_stats(self.env)
+        for letter in sorted(letters):
+            if letter not in cache:
+                cache[letter] = index.generate_entries(letters[letter])
+                if stats is not None:
+                    stats.count('index_misses')
+            elif stats is not None:
+                stats.count('index_hits')
+            yield letter, cache[letter]
+
+    def _remove_object(self, fullname):
+        """
+        Removes an object from the ``objects`` table of the domain data and
+        from the secondary indexes.
+        """
+        entry = self.data['objects'].pop(fullname)
+        self._old_objects.setdefault(fullname, entry)
+        objtype = entry[1]
+        self._changed_objects.add(fullname)
+        self._data_changed()
+        if objtype in graph_labels:
+            self._remove_graph_entry(fullname[len(objtype):], objtype)
+            return
+        if self._shortnames is None:
+            return
+        pkgname, shortname = split_fullname(fullname, objtype)
+        for index, key in [(self._shortnames, shortname),
+                           (self._pkgobjects, pkgname)]:
+            index[key].discard(fullname)
+            if not index[key]:
+                del index[key]
+
+    def add_message(self, name, deprecated, location=None):
+        """
+        Adds a message type to the domain data.
+
+        :param str name: The full name of the message type
+        :param bool deprecated: Indicates whether the message is deprecated.
+        :param location: The location to report a duplicate description at
+        :return: The unique anchor of the message type.
+        :rtype: str
+        """
+        # name -> document name, deprecated; the anchor is the name
+        self._set_index_entry('messages', name,
+                              (self.env.docname, deprecated))
+        self.note_object(name, 'message', self.env.docname, location)
         return name
@@ -0,0 +1,254 @@
+"""
+``sphinx_ros.graph`` module
+===========================
+
+This module defines the directives describing the ROS computation graph:
+nodes, topics, parameters, and service servers. The topics a node publishes
+and subscribes to, the services it provides, and the parameters it reads are
+given with doc fields of the node. They are added to an inverted map of the
+domain data, graph name -> relation -> nodes, when the node is described, so
+that the topic index lists the publishers and subscribers of every topic
+without searching the descriptions of all nodes.
+"""
+
+import re
+
+import sphinx
+from docutils import nodes
+from docutils.parsers.rst import directives
+from sphinx import addnodes
+from sphinx.directives import ObjectDescription
+from sphinx.util.docfields import TypedField
+from .directives import RosXRefMixin, name_to_key
+from .interfaces import split_array_type
+from .stats import timed
+from .xref_role import RosXRefRole
+
+#: graph object type -> label
+graph_labels = {
+    'node': 'node',
+    'topic': 'topic',
+    'param': 'parameter',
+    'service_server': 'service server',
+}
+
+#: graph object type -> relations of nodes to graph names of the type, see
+#: RosDomain.note_graph_links(), in the order references to names that are
+#: not described are resolved to the related nodes
+graph_relations = {
+    'topic': ('publisher', 'subscriber'),
+    'service_server': ('server',),
+    'param': ('parameter',),
+}
+
+
+def resolve_graph_name(name, node=None):
+    """
+    Resolve a graph name like ROS does: global names start with a slash,
+    private names with a tilde are in the namespace of the node, and
+    relative names are in the namespace the node is in, e.g. ``'~rate'`` is
+    ``'/ns/talker/rate'`` and ``'chatter'`` is ``'/ns/chatter'`` for the node
+    ``'/ns/talker'``. Without a node, names are in the root namespace.
+    """
+    if name.startswith('/'):
+        resolved = name
+    elif name.startswith('~'):
+        resolved = (node or '') + '/' + name[1:]
+    else:
+        resolved = (node or '').rpartition('/')[0] + '/' + name
+    return re.sub(r'/+', '/', resolved).rstrip('/') or '/'
+
+
+def graph_key(objtype, name):
+    """
+    Return the key of a graph object in the ``objects`` table of the domain
+    data, which is also its anchor, e.g. ``'topic/chatter'``. The object type
+    is part of it since e.g. a topic and a service may have the same name.
+    """
+    return objtype + name
+
+
+class RosGraphField(RosXRefMixin, TypedField):
+    """
+    Doc field of a node relating it to a graph name, e.g. the topics it
+    publishes. The relations of indexed nodes are recorded in the domain
+    data, see :meth:`~sphinx_ros.domain.RosDomain.note_graph_links`.
+    """
+
+    def make_xref(self, rolename, domain, target, innernode=nodes.emphasis,
+                  contnode=None, env=None):
+        if rolename not in graph_labels:
+            return super(RosGraphField, self).make_xref(
+                rolename, domain, target, innernode, contnode, env)
+        # Graph names keep their tilde, which starts a private name
+        if sphinx.version_info[:2] >= (1, 5):
+            result = TypedField.make_xref(self, rolename, domain, target,
+                                          innernode, contnode, env)
+        else:
+            result = TypedField.make_xref(self, rolename, domain, target,
+                                          innernode, contnode)
+        if env is not None:
+            result['ros:node'] = env.ref_context.get('ros:node')
+        return result
+
+    def make_field(self, types, domain, items, env=None):
+        # The node described, kept in the reference context since nested
+        # directives reset the 'object' of the temporary data
+        node = env is not None and env.ref_context.get('ros:node')
+        if node:
+            ros_domain = env.get_domain('ros')
+            entry = ros_domain.data['objects'].get(graph_key('node', node))
+            links = []
+            for fieldarg, _ in items:
+                fieldtype = types.get(fieldarg, ())
+                type_ = ''.join(n.astext() for n in fieldtype)
+                links.append((self.name, resolve_graph_name(fieldarg, node),
+                              type_))
+                base = split_array_type(type_.lstrip('.~'))[0]
+                if self.typerolename and base and \
+                        base not in RosXRefRole.ros_msg_primitives:
+                    ros_domain.note_type_ref(env.docname, (
+                        env.ref_context.get('ros:package'), base,
+                        self.typerolename, 1))
+            if entry is not None and entry[0] == env.docname:
+                ros_domain.note_graph_links(node, links, env.docname)
+        return super(RosGraphField, self).make_field(types, domain, items,
+                                                     env)
+
+
+class RosGraphObject(ObjectDescription):
+    """
+    Super class for the objects of the computation graph. The signature is
+    the graph name of the object, relative to the node being described, if
+    any, see :func:`resolve_graph_name`.
+    """
+
+    option_spec = {
+        'noindex': directives.flag,
+    }
+
+    #: The role linking the type given with the ``type`` option, if any.
+    type_role = None
+
+    @timed('handle_signature')
+    def handle_signature(self, sig, signode):
+        name = resolve_graph_name(sig.strip(),
+                                  self.env.ref_context.get('ros:node'))
+        sig_prefix = graph_labels[self.objtype] + ' '
+        signode += addnodes.desc_annotation(sig_prefix, sig_prefix)
+        signode += addnodes.desc_name(name, name)
+        type_ = self.options.get('type')
+        if type_:
+            signode += addnodes.desc_annotation(' : ', ' : ')
+            signode += self.make_type(type_)
+        return name
+
+    def make_type(self, type_):
+        """
+        Return the nodes showing the type of the object in the signature.
+        """
+        if self.type_role is None:
+            return [addnodes.desc_type(type_, type_)]
+        text = ':ros:{}:`{}`'.format(self.type_role, type_)
+        nodes_, _ = self.state.inline_text(text, self.lineno)
+        return nodes_
+
+    @timed('add_target_and_index')
+    def add_target_and_index(self, name, sig, signode):
+        key = graph_key(self.objtype, name)
+        if key in self.state.document.ids:
+            return
+        signode['names'].append(key)
+        signode['ids'].append(key)
+        signode['first'] = (not self.names)
+        self.state.document.note_explicit_target(signode)
+
+        self.env.get_domain('ros').note_object(
+            key, self.objtype, self.env.docname,
+            location=(self.env.docname, self.lineno))
+
+        indextext = '{} (ROS {})'.format(name, graph_labels[self.objtype])
+        if sphinx.version_info[:2] >= (1, 4):
+            entry = ('single', indextext, key, '',
+                     name_to_key(name.lstrip('/') or name))
+        else:
+            entry = ('single', indextext, key, '')
+        self.indexnode['entries'].append(entry)
+
+
+class RosNodeDirective(RosGraphObject):
+    """
+    Description of a ROS node. Graph names in its doc fields and in the
+    directives in its content are relative to the node.
+    """
+
+    doc_field_types = [
+        RosGraphField('publisher',
+                      label='Publishes',
+                      names=('pub',),
+                      rolename='topic',
+                      typerolename='msg',
+                      typenames=('pubtype',),
+                      can_collapse=True),
+        RosGraphField('subscriber',
+                      label='Subscribes',
+                      names=('sub',),
+                      rolename='topic',
+                      typerolename='msg',
+                      typenames=('subtype',),
+                      can_collapse=True),
+        RosGraphField('server',
+                      label='Services',
+                      names=('srv',),
+                      rolename='service_server',
+                      typerolename='srv',
+                      typenames=('srvtype',),
+                      can_collapse=True),
+        RosGraphField('parameter',
+                      label='Parameters',
+                      names=('param',),
+                      rolename='param',
+                      typerolename=None,
+                      typenames=('paramtype',),
+                      can_collapse=True),
+    ]
+
+    def before_content(self):
+        self.previous_node = self.env.ref_context.get('ros:node')
+        if self.names:
+            self.env.ref_context['ros:node'] = self.names[0]
+
+    def after_content(self):
+        if self.previous_node is None:
+            self.env.ref_context.pop('ros:node', None)
+        else:
+            self.env.ref_context['ros:node'] = self.previous_node
+
+
+class RosTopicDirective(RosGraphObject):
+    """
+    Description of a ROS topic, with its message type given by the ``type``
+    option.
+    """
+
+    option_spec = dict(RosGraphObject.option_spec, type=directives.unchanged)
+    type_role = 'msg'
+
+
+class RosParamDirective(RosGraphObject):
+    """
+    Description of a ROS parameter, with its type given by the ``type``
+    option.
+    """
+
+    option_spec = dict(RosGraphObject.option_spec, type=directives.unchanged)
+
+
+class RosServiceServerDirective(RosGraphObject):
+    """
+    Description of a ROS service server, with its service type given by the
+    ``type`` option.
+    """
+
+    option_spec = dict(RosGraphObject.option_spec, type=directives.unchanged)
+    type_role = 'srv'
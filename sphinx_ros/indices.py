@@ -2,11 +2,58 @@
 ``sphinx_ros.indices`` module
 =============================
 
-This modules defines the indices added to Sphinx.
+This modules defines the indices added to Sphinx. The entries of the package
+and message indices are cached per letter in the domain data, see
+:meth:`~sphinx_ros.domain.RosDomain.get_index_content`, so that only the
+letters with changed entries are generated again. The topic index is
+generated from the inverted map of graph names to nodes, see
+:meth:`~sphinx_ros.domain.RosDomain.note_graph_links`.
+
+With :confval:`ros_message_index_pages`, the HTML message index is split
+into a page per letter or per package, listed on the index page itself. The
+pages are generated and written one at a time, see collect_index_pages().
 """
+import itertools
+import re
+
 from six import iteritems
 from sphinx.domains import Index
 
+from .graph import graph_key
+
+#: The values of :confval:`ros_message_index_pages`.
+index_page_modes = ('letter', 'package')
+
+
+def count_label(n):
+    """
+    Return the text telling how many message types a page of the index
+    lists.
+    """
+    return n == 1 and '1 message type' or '{} message types'.format(n)
+
+
+def group_by_letter(entries):
+    """
+    Return sorted index entries as index content, i.e. grouped by the first
+    letter of their names.
+    """
+    return [(letter, list(group)) for letter, group in
+            itertools.groupby(entries, lambda entry: entry[0][:1].lower())]
+
+
+def filter_content(content, docnames):
+    """
+    Return the index content with only the entries in ``docnames``.
+    """
+    docnames = set(docnames)
+    filtered = []
+    for letter, entries in content:
+        entries = [entry for entry in entries if entry[2] in docnames]
+        if entries:
+            filtered.append((letter, entries))
+    return filtered
+
 
 class RosMessageIndex(Index):
     """
@@ -16,43 +63,106 @@ class RosMessageIndex(Index):
     name = 'msgindex'
     localname = 'Message Type Index'
     shortname = 'msgs'
+    table = 'messages'
 
-    def generate(self, docnames=None):
-        content = {}
-        # Get messages from domain data
+    def generate_entries(self, msgnames):
+        """
+        Generate the sorted index entries of the given messages.
+        """
         messages = self.domain.data['messages']
-        base_messages = {}
+        base_messages = []
 
-        # Split package name and make new dict.
-        # name -> document name, anchor, priority, deprecated
-        for msgname, (docname, anchor, _, deprecated) in iteritems(messages):
+        # Split package name and make new list.
+        # name -> document name, deprecated; the anchor is the name
+        for msgname in msgnames:
+            docname, deprecated = messages[msgname]
             pkgname, _, base_msgname = msgname.split('.')
-            base_messages[base_msgname] = (pkgname, docname, anchor,
-                                           deprecated)
+            base_messages.append((base_msgname, (pkgname, docname, msgname,
+                                                 deprecated)))
 
-        # Sort the messages in alphabetical order
-        base_messages = sorted(iteritems(base_messages),
-                               key=lambda x: x[0].lower())
+        # Sort the messages in alphabetical order, messages with the same name
+        # are ordered by package so that the index does not depend on the
+        # order in which documents were read.
+        base_messages.sort(key=lambda x: (x[0].lower(), x[1][0]))
 
+        entries = []
         # base_name -> pkg name, document name, anchor, deprecated
         for base_msgname, (pkg, docname, anchor, deprecated) in base_messages:
-            if docnames and docname not in docnames:
-                continue
-
-            if base_msgname[0].lower() in content:
-                entries = content[base_msgname[0].lower()]
-            else:
-                entries = []
-
             qualifier = deprecated and 'Deprecated' or ''
             entries.append([base_msgname + ' (in {})'.format(pkg), 0,
                             docname, anchor, '', qualifier, ''])
-            content[base_msgname[0].lower()] = entries
+        return entries
+
+    def get_page_mode(self):
+        """
+        Return how the index is split into pages, ``'letter'`` or
+        ``'package'``, or ``None`` if it is a single page.
+        """
+        mode = self.domain.env.config.ros_message_index_pages
+        return mode in index_page_modes and mode or None
+
+    def get_pagename(self, key):
+        """
+        Return the name of the page listing the messages of a letter or a
+        package, e.g. ``'ros-msgindex-foo_pkg'``.
+        """
+        if not re.match(r'^[A-Za-z0-9_]+$', key):
+            key = '-'.join('u%04x' % ord(c) for c in key)
+        return '{}-{}-{}'.format(self.domain.name, self.name, key)
+
+    def get_package_messages(self):
+        """
+        Return the names of the documented message types by package.
 
-        content = sorted(content.items())
+        :rtype: dict
+        """
+        packages = {}
+        for msgname in self.domain.data['messages']:
+            packages.setdefault(msgname.split('.', 1)[0], []).append(msgname)
+        return packages
 
+    def generate(self, docnames=None):
+        # Only the HTML builders, which generate the index for all documents,
+        # write the pages, see collect_index_pages()
+        mode = docnames is None and self.get_page_mode()
+        if mode == 'letter':
+            entries = [[letter.upper(), 0, self.get_pagename(letter), '',
+                        count_label(len(entries)), '', '']
+                       for letter, entries
+                       in self.domain.iter_index_content(self)]
+            return group_by_letter(entries), False
+        if mode == 'package':
+            entries = [[pkgname, 0, self.get_pagename(pkgname), '',
+                        count_label(len(msgnames)), '', '']
+                       for pkgname, msgnames in sorted(iteritems(
+                           self.get_package_messages()))]
+            return group_by_letter(entries), False
+        content = self.domain.get_index_content(self)
+        if docnames:
+            content = filter_content(content, docnames)
         return content, True
 
+    def iter_pages(self):
+        """
+        Generate the pages of the index split by letter or package, one at a
+        time.
+
+        :return: The name, title, and content of every page.
+        :rtype: iterator
+        """
+        mode = self.get_page_mode()
+        if mode == 'letter':
+            for letter, entries in self.domain.iter_index_content(self):
+                yield (self.get_pagename(letter),
+                       '{}: {}'.format(self.localname, letter.upper()),
+                       [(letter, entries)])
+        elif mode == 'package':
+            for pkgname, msgnames in sorted(iteritems(
+                    self.get_package_messages())):
+                yield (self.get_pagename(pkgname),
+                       '{}: {}'.format(self.localname, pkgname),
+                       group_by_letter(self.generate_entries(msgnames)))
+
 
 class RosPackageIndex(Index):
     """
@@ -62,28 +172,113 @@ class RosPackageIndex(Index):
     name = 'pkgindex'
     localname = 'Package Index'
     shortname = 'pkgs'
+    table = 'packages'
+
+    def generate_entries(self, pkgnames):
+        """
+        Generate the sorted index entries of the given packages.
+        """
+        packages = self.domain.data['packages']
+        entries = []
+
+        # name -> document name, deprecated
+        for pkgname in sorted(pkgnames, key=lambda x: x.lower()):
+            docname, deprecated = packages[pkgname]
+            qualifier = deprecated and 'Deprecated' or ''
+            entries.append([pkgname, 0, docname,
+                            self.domain.package_anchor(pkgname), '',
+                            qualifier, ''])
+        return entries
 
     def generate(self, docnames=None):
-        content = {}
+        content = self.domain.get_index_content(self)
+        if docnames:
+            content = filter_content(content, docnames)
+        return content, True
+
+
+class RosTopicIndex(Index):
+    """
+    Index listing the topics, with the nodes publishing and subscribing to
+    them.
+    """
 
-        # Sort the packages in alphabetical order
-        packages = sorted(iteritems(self.domain.data['packages']),
-                          key=lambda x: x[0].lower())
+    name = 'topicindex'
+    localname = 'Topic Index'
+    shortname = 'topics'
+    #: not cached per letter, see RosDomain.get_index_content()
+    table = None
 
-        # name -> document name, anchor, priority, deprecated
-        for pkgname, (docname, anchor, _, deprecated) in packages:
-            if docnames and docname not in docnames:
+    #: node relation -> extra text of the entries
+    relations = {'publisher': 'publisher', 'subscriber': 'subscriber'}
+
+    def generate(self, docnames=None):
+        objects = self.domain.data['objects']
+        graph = self.domain.data['graph']
+        # The described topics are in the graph map as well
+        topics = [name for name, links in iteritems(graph)
+                  if 'topic' in links or any(relation in links
+                                             for relation in self.relations)]
+        if docnames:
+            docnames = set(docnames)
+
+        content = {}
+        for topic in sorted(topics, key=lambda x: (x.lower(), x)):
+            links = graph.get(topic, {})
+            subentries = []
+            types = set()
+            for relation in sorted(self.relations):
+                for node, type_ in sorted(links.get(relation, ())):
+                    if type_:
+                        types.add(type_)
+                    key = graph_key('node', node)
+                    if key not in objects:
+                        continue
+                    docname = objects[key][0]
+                    if docnames and docname not in docnames:
+                        continue
+                    subentries.append([node, 2, docname, key,
+                                       self.relations[relation], '', type_])
+            key = graph_key('topic', topic)
+            docname, anchor = '', ''
+            if key in objects:
+                docname, anchor = objects[key][0], key
+            elif not subentries:
+                continue
+            if docnames and docname not in docnames and not subentries:
                 continue
+            entries = content.setdefault(topic.lstrip('/')[:1].lower(), [])
+            entries.append([topic, subentries and 1 or 0, docname, anchor, '',
+                            '', ', '.join(sorted(types))])
+            entries.extend(subentries)
+        return sorted(content.items()), False
 
-            if pkgname[0].lower() in content:
-                entries = content[pkgname[0].lower()]
-            else:
-                entries = []
 
-            qualifier = deprecated and 'Deprecated' or ''
-            entries.append([pkgname, 0, docname, anchor, '', qualifier, ''])
-            content[pkgname[0].lower()] = entries
+def update_index_cache(app, env):
+    """
+    Handler for the ``env-updated`` event, generating the index entries of the
+    letters that changed while reading. This happens before the environment
+    is pickled, so that the cached entries are kept for the next build.
+    """
+    domain = env.get_domain('ros')
+    for index in domain.indices:
+        if index.table is not None:
+            domain.get_index_content(index(domain))
 
-        content = sorted(content.items())
 
-        return content, True
+def collect_index_pages(app):
+    """
+    Handler for the ``html-collect-pages`` event, generating the pages of the
+    message index if :confval:`ros_message_index_pages` is set and the index
+    is written. The builder writes every page before the next one is
+    generated.
+    """
+    index_names = [name for name, _, _, _
+                   in getattr(app.builder, 'domain_indices', ())]
+    index = RosMessageIndex(app.env.get_domain('ros'))
+    if index.get_page_mode() is None or \
+            '{}-{}'.format(index.domain.name, index.name) not in index_names:
+        return
+    for pagename, title, content in index.iter_pages():
+        yield pagename, {'indextitle': title, 'content': content,
+                         'collapse_index': False}, 'domainindex.html'
@@ -0,0 +1,1046 @@
+"""
+``sphinx_ros.interfaces`` module
+================================
+
+This module parses ROS interface definition files (``.msg``, ``.srv``, and
+``.action`` files, and the ``.idl`` files of ROS 2) into a simple field model
+that can be rendered by the message, service, and action directives, and
+discovers the interfaces of a package from its ``package.xml`` file. Parsed
+files are cached during the build, keyed on their modification time and the
+hash of their contents, and the cache is saved in the doctree directory
+between builds.
+"""
+
+import collections
+import hashlib
+import io
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+
+from six.moves import cPickle as pickle
+from sphinx.util import logging
+from .stats import get_build_stats
+
+logger = logging.getLogger(__name__)
+
+
+#: A field of an interface, e.g. ``float64[9] covariance``.
+InterfaceField = collections.namedtuple(
+    'InterfaceField', ['type', 'name', 'comment', 'default'])
+
+#: A constant of an interface, e.g. ``uint8 DEBUG=1``.
+InterfaceConstant = collections.namedtuple(
+    'InterfaceConstant', ['type', 'name', 'value', 'comment'])
+
+#: A section of an interface, e.g. the request of a service.
+InterfaceSection = collections.namedtuple(
+    'InterfaceSection', ['fields', 'constants'])
+
+#: A parsed interface file.
+Interface = collections.namedtuple(
+    'Interface', ['kind', 'comment', 'sections'])
+
+#: A package, as described by its ``package.xml`` file, and the interface
+#: files found in its ``msg``, ``srv``, and ``action`` directories.
+PackageInfo = collections.namedtuple(
+    'PackageInfo', ['name', 'version', 'description', 'maintainers',
+                    'authors', 'licenses', 'urls', 'depends', 'deprecated',
+                    'interfaces'])
+
+#: The dependency tags of ``package.xml``, in the order they are listed.
+package_depend_tags = ('depend', 'build_depend', 'build_export_depend',
+                       'buildtool_depend', 'exec_depend', 'run_depend',
+                       'test_depend', 'doc_depend')
+
+#: The interface kinds, which are also the names of the directories of a
+#: package that contain the interface files.
+interface_kinds = ('msg', 'srv', 'action')
+
+#: Files that exclude a directory from the build of a ROS workspace.
+ignore_markers = frozenset(['CATKIN_IGNORE', 'COLCON_IGNORE', 'AMENT_IGNORE'])
+
+#: The minimum number of modified interface files that are parsed in a pool
+#: of processes, fewer are not worth starting it.
+min_parallel_files = 64
+
+#: The number of sections separated by ``---`` per interface kind.
+interface_sections = {
+    'msg': 1,
+    'srv': 2,
+    'action': 3,
+}
+
+field_re = re.compile(
+    r'''^(?P<type>[\w/]+(?:<=\d+)?(?:\[(?:<=)?\d*\])?) \s+  # field type
+         (?P<name>\w+)                                     # field name
+         (?:\s*=\s*(?P<value>.*?)                          # constant value
+          |\s+(?P<default>.*?))? \s*$                      # default value
+     ''', re.VERBOSE)
+
+type_re = re.compile(
+    r'''^(?P<base>[\w/]+)               # base type
+         (?P<suffix>(?:<=\d+)?          # string bound
+                    (?:\[(?:<=)?\d*\])? # array specification
+         )$
+     ''', re.VERBOSE)
+
+
+class InterfaceParseError(ValueError):
+    """
+    Raised when an interface file can not be parsed.
+    """
+
+
+def split_array_type(type_):
+    """
+    Split a field type into the base type and the bound and array suffix,
+    e.g. ``'float64[9]'`` into ``('float64', '[9]')``.
+
+    :param str type_: The field type
+    :return: The base type and the (possibly empty) suffix.
+    :rtype: tuple
+    """
+    m = type_re.match(type_)
+    if m is None:
+        return type_, ''
+    return m.group('base'), m.group('suffix')
+
+
+def _split_comment(line):
+    """
+    Split a line into its definition and comment part.
+    """
+    definition, sep, comment = line.partition('#')
+    return definition.strip(), sep and comment.strip() or None
+
+
+def parse_interface(text, kind):
+    """
+    Parse the contents of an interface file.
+
+    Comments on the lines directly preceding a field or constant, and a
+    comment on the same line, are attached to that field or constant. The
+    first block of comments in the file is the description of the interface
+    when it is followed by an empty line.
+
+    :param str text: The contents of the interface file
+    :param str kind: The interface kind, ``'msg'``, ``'srv'`` or ``'action'``
+    :return: The parsed interface.
+    :rtype: Interface
+    :raises InterfaceParseError: If a line can not be parsed.
+    """
+    if kind not in interface_sections:
+        raise InterfaceParseError('unknown interface kind %r' % kind)
+    comment = []
+    sections = [InterfaceSection([], [])]
+    pending = []
+    seen_definition = False
+
+    for lineno, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if stripped == '---':
+            sections.append(InterfaceSection([], []))
+            pending = []
+            seen_definition = True
+            continue
+        if not stripped:
+            if pending and not seen_definition and not comment:
+                comment = pending
+            pending = []
+            continue
+        definition, trailing = _split_comment(stripped)
+        if not definition:
+            pending.append(trailing)
+            continue
+
+        m = field_re.match(definition)
+        if m is None:
+            raise InterfaceParseError('line %d: invalid definition %r' %
+                                      (lineno, stripped))
+        seen_definition = True
+        if m.group('value') is not None and \
+                split_array_type(m.group('type'))[0] == 'string':
+            # String constants take the rest of the line verbatim
+            definition, trailing = stripped, None
+            m = field_re.match(definition)
+        docs = pending + (trailing and [trailing] or [])
+        pending = []
+        section = sections[-1]
+        if m.group('value') is not None:
+            section.constants.append(InterfaceConstant(
+                m.group('type'), m.group('name'), m.group('value'),
+                ' '.join(docs)))
+        else:
+            section.fields.append(InterfaceField(
+                m.group('type'), m.group('name'), ' '.join(docs),
+                m.group('default') or None))
+
+    if pending and not seen_definition and not comment:
+        comment = pending
+    if len(sections) != interface_sections[kind]:
+        raise InterfaceParseError(
+            'expected %d section(s) in %s file, found %d' %
+            (interface_sections[kind], kind, len(sections)))
+    return Interface(kind, ' '.join(comment), sections)
+
+
+#: IDL type -> ROS field type, the other primitive types have the same name
+idl_types = {
+    'boolean': 'bool',
+    'octet': 'byte',
+    'float': 'float32',
+    'double': 'float64',
+    'short': 'int16',
+    'unsigned short': 'uint16',
+    'long': 'int32',
+    'unsigned long': 'uint32',
+    'long long': 'int64',
+    'unsigned long long': 'uint64',
+}
+
+#: The suffixes of the names of the structures of each section of an
+#: interface in an IDL file, e.g. ``Foo_Request`` and ``Foo_Response``.
+idl_section_suffixes = {
+    'msg': ('',),
+    'srv': ('_Request', '_Response'),
+    'action': ('_Goal', '_Result', '_Feedback'),
+}
+
+#: The member rosidl adds to structures without fields.
+idl_empty_member = 'structure_needs_at_least_one_member'
+
+idl_token_re = re.compile(
+    r'''(?P<skip>\s+|//[^\n]*|/\*.*?\*/|^[ \t]*\#[^\n]*)
+      |(?P<string>L?"(?:[^"\\]|\\.)*")
+      |(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+      |(?P<name>(?:::)?\w+(?:::\w+)*)
+      |(?P<punct>.)
+    ''', re.VERBOSE | re.DOTALL | re.MULTILINE)
+
+
+def _unquote(literal):
+    """
+    Return the value of an IDL string literal.
+    """
+    escapes = {'n': '\n', 't': '\t'}
+    return re.sub(r'\\(.)', lambda m: escapes.get(m.group(1), m.group(1)),
+                  literal.lstrip('L')[1:-1])
+
+
+class _IdlParser(object):
+    """
+    Recursive descent parser of the subset of IDL written by rosidl: nested
+    modules with structures, constants, and typedefs, and annotations.
+    """
+
+    def __init__(self, text):
+        self.tokens = []
+        for m in idl_token_re.finditer(text):
+            if m.lastgroup != 'skip':
+                self.tokens.append((m.lastgroup, m.group()))
+        self.pos = 0
+        #: structure name -> (comment, fields)
+        self.structs = collections.OrderedDict()
+        #: module name -> constants
+        self.constants = {}
+        #: typedef name -> ROS field type
+        self.typedefs = {}
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos][1]
+        return None
+
+    def next(self):
+        if self.pos >= len(self.tokens):
+            raise InterfaceParseError('unexpected end of IDL file')
+        self.pos += 1
+        return self.tokens[self.pos - 1][1]
+
+    def expect(self, value):
+        token = self.next()
+        if token != value:
+            raise InterfaceParseError('expected %r in IDL file, found %r' %
+                                      (value, token))
+
+    def parse_definitions(self, module):
+        while self.peek() not in (None, '}'):
+            annotations = self.parse_annotations()
+            keyword = self.next()
+            if keyword == 'module':
+                name = self.next()
+                self.expect('{')
+                self.parse_definitions(name)
+                self.expect('}')
+            elif keyword == 'struct':
+                name = self.next()
+                self.expect('{')
+                fields = []
+                while self.peek() != '}':
+                    fields.extend(self.parse_member())
+                self.expect('}')
+                self.structs[name] = (annotations.get('comment', ''), fields)
+            elif keyword == 'const':
+                type_ = self.parse_type()
+                name = self.next()
+                self.expect('=')
+                value = self.parse_value()
+                self.constants.setdefault(module, []).append(
+                    InterfaceConstant(type_, name, value,
+                                      annotations.get('comment', '')))
+            elif keyword == 'typedef':
+                type_ = self.parse_type()
+                name = self.next()
+                self.typedefs[name] = type_ + self.parse_array_suffix()
+            else:
+                raise InterfaceParseError('unsupported IDL definition %r' %
+                                          keyword)
+            self.expect(';')
+
+    def parse_annotations(self):
+        """
+        Parse the annotations before a definition or member, returning the
+        comment of a ``@verbatim`` annotation and the value of a
+        ``@default`` annotation.
+        """
+        annotations = {}
+        while self.peek() == '@':
+            self.next()
+            name = self.next()
+            params = {}
+            if self.peek() == '(':
+                self.next()
+                while self.peek() != ')':
+                    key = 'value'
+                    if self.tokens[self.pos + 1:self.pos + 2] == [
+                            ('punct', '=')]:
+                        key = self.next()
+                        self.next()
+                    params[key] = self.parse_literal()
+                    if self.peek() == ',':
+                        self.next()
+                self.expect(')')
+            if name == 'verbatim' and \
+                    _unquote(params.get('language', '""')) == 'comment':
+                text = _unquote(params.get('text', '""'))
+                annotations['comment'] = ' '.join(text.split())
+            elif name == 'default':
+                annotations['default'] = params.get('value')
+        return annotations
+
+    def parse_literal(self):
+        """
+        Parse a literal, concatenating adjacent string literals.
+        """
+        kind, token = self.tokens[self.pos]
+        self.next()
+        if kind == 'string':
+            while self.pos < len(self.tokens) and \
+                    self.tokens[self.pos][0] == 'string':
+                token = token[:-1] + self.next().lstrip('L')[1:]
+        return token
+
+    def parse_value(self):
+        """
+        Parse the value of a constant in the notation of ``.msg`` files.
+        """
+        value = self.parse_literal()
+        if value.startswith(('"', 'L"')):
+            return _unquote(value)
+        return {'TRUE': 'True', 'FALSE': 'False'}.get(value, value)
+
+    def parse_type(self):
+        """
+        Parse a type specification and return it as a ROS field type, e.g.
+        ``'string<=10[<=5]'`` for ``sequence<string<10>, 5>``.
+        """
+        token = self.next()
+        if token == 'sequence':
+            self.expect('<')
+            type_ = self.parse_type()
+            bound = ''
+            if self.peek() == ',':
+                self.next()
+                bound = '<=' + self.next()
+            self.expect('>')
+            return type_ + '[' + bound + ']'
+        if token in ('string', 'wstring'):
+            if self.peek() == '<':
+                self.next()
+                token += '<=' + self.next()
+                self.expect('>')
+            return token
+        if token == 'unsigned' or token == 'long':
+            while self.peek() in ('short', 'long', 'double'):
+                token += ' ' + self.next()
+            return idl_types.get(token, token)
+        if token in self.typedefs:
+            return self.typedefs[token]
+        parts = token.strip(':').split('::')
+        if len(parts) >= 3:
+            # e.g. foo_pkg::msg::Foo, written as foo_pkg/Foo in .msg files
+            return parts[0] + '/' + parts[-1]
+        return idl_types.get(parts[-1], parts[-1])
+
+    def parse_array_suffix(self):
+        suffix = ''
+        while self.peek() == '[':
+            self.next()
+            suffix += '[' + self.next() + ']'
+            self.expect(']')
+        return suffix
+
+    def parse_member(self):
+        annotations = self.parse_annotations()
+        type_ = self.parse_type()
+        fields = []
+        while True:
+            name = self.next()
+            field_type = type_ + self.parse_array_suffix()
+            default = annotations.get('default')
+            if default is not None and default.startswith(('"', 'L"')) and \
+                    split_array_type(field_type)[0] not in ('string',
+                                                           'wstring'):
+                default = _unquote(default)  # e.g. the values of an array
+            if name != idl_empty_member:
+                fields.append(InterfaceField(
+                    field_type, name, annotations.get('comment', ''),
+                    default))
+            if self.peek() != ',':
+                break
+            self.next()
+        self.expect(';')
+        return fields
+
+
+def parse_idl(text, kind):
+    """
+    Parse the contents of an IDL file as generated by rosidl for a ROS 2
+    message, service, or action, e.g. ``foo_pkg/msg/Foo.idl``, into the same
+    field model as parse_interface(). Types are written as in ``.msg``
+    files: ``sequence<int32, 5>`` becomes ``int32[<=5]``, ``string<10>``
+    becomes ``string<=10``, and ``foo_pkg::msg::Bar`` becomes
+    ``foo_pkg/Bar``. The ``@verbatim`` comments of the structures and their
+    members are their descriptions and the ``@default`` values the default
+    values of the fields. The constants of a structure are the constants of
+    the module named after it, e.g. ``Foo_Constants``.
+
+    :param str text: The contents of the IDL file
+    :param str kind: The interface kind, ``'msg'``, ``'srv'`` or ``'action'``
+    :return: The parsed interface.
+    :rtype: Interface
+    :raises InterfaceParseError: If the file can not be parsed.
+    """
+    if kind not in idl_section_suffixes:
+        raise InterfaceParseError('unknown interface kind %r' % kind)
+    parser = _IdlParser(text)
+    parser.parse_definitions(None)
+    if parser.peek() is not None:
+        raise InterfaceParseError('unexpected %r in IDL file' % parser.peek())
+
+    suffixes = idl_section_suffixes[kind]
+    names = [name[:len(name) - len(suffixes[0])] for name in parser.structs
+             if name.endswith(suffixes[0])]
+    if not names:
+        raise InterfaceParseError('no %s structure in IDL file' % kind)
+    sections = []
+    for suffix in suffixes:
+        name = names[0] + suffix
+        if name not in parser.structs:
+            raise InterfaceParseError('no structure %s in IDL file' % name)
+        sections.append(InterfaceSection(
+            parser.structs[name][1],
+            parser.constants.get(name + '_Constants', [])))
+    return Interface(kind, parser.structs[names[0] + suffixes[0]][0],
+                     sections)
+
+
+#: syntax -> function parsing the contents of an interface file
+interface_parsers = {
+    'msg': parse_interface,
+    'idl': parse_idl,
+}
+
+
+def interface_syntax(filename):
+    """
+    Return the syntax of an interface file, ``'idl'`` for ``.idl`` files and
+    ``'msg'`` for the ``.msg``, ``.srv``, and ``.action`` files.
+    """
+    return filename.endswith('.idl') and 'idl' or 'msg'
+
+
+def interface_kind(filename):
+    """
+    Return the kind of an interface file, its extension or, for ``.idl``
+    files, the name of the directory it is in, e.g. ``'srv'`` for
+    ``foo_pkg/srv/Foo.idl``.
+    """
+    if interface_syntax(filename) == 'idl':
+        return os.path.basename(os.path.dirname(filename))
+    return os.path.splitext(filename)[1].lstrip('.')
+
+
+def _interface_files(kind, files):
+    """
+    Return the interface files of a ``msg``, ``srv``, or ``action``
+    directory. An ``.idl`` file is left out if the directory has a file of
+    the same name in the syntax of ROS 1, since rosidl generates the former
+    from the latter.
+    """
+    names = set(os.path.splitext(f)[0] for f in files
+                if f.endswith('.' + kind))
+    return [f for f in files if f.endswith('.' + kind) or
+            f.endswith('.idl') and os.path.splitext(f)[0] not in names]
+
+
+def _text(element):
+    if element is None:
+        return ''
+    return ' '.join((element.text or '').split())
+
+
+def _person(element):
+    name = _text(element)
+    email = element.get('email')
+    return email and '{} <{}>'.format(name, email) or name
+
+
+def parse_package_xml(text):
+    """
+    Parse the contents of a ``package.xml`` file (format 1, 2, or 3).
+
+    :param text: The contents of the ``package.xml`` file
+    :return: The package description, without interfaces.
+    :rtype: PackageInfo
+    :raises InterfaceParseError: If the file is not a package manifest.
+    """
+    try:
+        root = ElementTree.fromstring(text)
+    except ElementTree.ParseError as exc:
+        raise InterfaceParseError('invalid package.xml: %s' % exc)
+    if root.tag != 'package' or root.find('name') is None:
+        raise InterfaceParseError('invalid package.xml: no package name')
+
+    depends = collections.OrderedDict()
+    for tag in package_depend_tags:
+        names = [_text(e) for e in root.findall(tag)]
+        if names:
+            depends[tag] = names
+    deprecated = root.find('export/deprecated')
+    return PackageInfo(
+        name=_text(root.find('name')),
+        version=_text(root.find('version')),
+        description=_text(root.find('description')),
+        maintainers=[_person(e) for e in root.findall('maintainer')],
+        authors=[_person(e) for e in root.findall('author')],
+        licenses=[_text(e) for e in root.findall('license')],
+        urls=[(e.get('type', 'website'), _text(e))
+              for e in root.findall('url')],
+        depends=depends,
+        deprecated=deprecated is not None,
+        interfaces=[])
+
+
+def _stamp(path):
+    """
+    Return the modification time and size of a file or directory, or
+    ``None`` if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+def _package_stamps(path):
+    """
+    Return the stamps of the manifest and the interface directories of a
+    package. The stamp of a directory changes when files are added to or
+    removed from it.
+    """
+    return tuple(_stamp(os.path.join(path, name)) for name in
+                 ('package.xml',) + interface_kinds)
+
+
+class InterfaceCache(object):
+    """
+    Cache of parsed interface files and scanned packages.
+
+    Interface files are keyed on their kind, syntax, and contents hash so
+    that files with the same contents are parsed once. The modification
+    time and size of each file are remembered as well, so that files that
+    were not touched since they were parsed are not even read again.
+    """
+
+    #: Bump when the layout of the cache or the parse results change.
+    version = 3
+
+    #: Cache the entries set in a parallel reader are also set in, see
+    #: get_interface_cache()
+    changes = None
+
+    def __init__(self):
+        #: (kind, syntax, digest) -> Interface
+        self.entries = {}
+        #: file name -> (stamp, (kind, syntax, digest))
+        self.files = {}
+        #: package path -> (stamps, PackageInfo)
+        self.packages = {}
+        #: directory -> (stamps of the directories searched, package paths)
+        self.roots = {}
+
+    def parse(self, filename, kind=None, stats=None):
+        """
+        Parse an interface file, or return the cached result if the file was
+        not modified or a file with the same contents was parsed before.
+
+        :param str filename: The absolute path to the interface file
+        :param str kind: The interface kind, defaults to the one given by the
+                         file name, see interface_kind()
+        :param stats: The statistics of the build to count cache hits in
+        :type stats: sphinx_ros.stats.BuildStats
+        :return: The parsed interface.
+        :rtype: Interface
+        """
+        if kind is None:
+            kind = interface_kind(filename)
+        key, data = self._read(filename, kind)
+        if key in self.entries:
+            if stats is not None:
+                stats.count('interface_hits')
+            return self.entries[key]
+        if data is None:
+            # Known file, but the contents were not parsed successfully
+            key, data = self._read(filename, kind, force=True)
+        if stats is not None:
+            stats.count('interface_misses')
+        self._set('entries', key,
+                  interface_parsers[key[1]](data.decode('utf-8'), kind))
+        return self.entries[key]
+
+    def parse_all(self, filenames, workers=1, stats=None):
+        """
+        Parse the interface files that were modified since they were last
+        parsed, in a pool of ``workers`` processes. Files that can not be
+        read or parsed are skipped, parse() reports the error when the file
+        is used.
+
+        :param filenames: The absolute paths to the interface files
+        :param int workers: The number of processes to parse in
+        :param stats: The statistics of the build to count cache hits in
+        :type stats: sphinx_ros.stats.BuildStats
+        :return: The number of files parsed.
+        :rtype: int
+        """
+        todo = {}
+        stale = set()
+        for filename in filenames:
+            try:
+                key, data = self._read(filename, interface_kind(filename),
+                                       stale=stale)
+            except (IOError, OSError):
+                continue
+            if key in self.entries:
+                if stats is not None:
+                    stats.count('interface_hits')
+            elif data is not None:
+                todo[key] = data
+        if stale:
+            self._evict(stale)
+
+        keys = list(todo)
+        jobs = [key[:2] + (todo[key],) for key in keys]
+        results = None
+        if workers > 1 and len(jobs) >= min_parallel_files:
+            import multiprocessing
+            try:
+                pool = multiprocessing.Pool(workers)
+            except (OSError, ImportError) as exc:
+                logger.info('failed to start the ROS interface parsers: %s',
+                            exc)
+            else:
+                try:
+                    results = pool.map(_parse_job, jobs,
+                                       chunksize=len(jobs) // workers // 4 + 1)
+                finally:
+                    pool.close()
+                    pool.join()
+        if results is None:
+            results = [_parse_job(job) for job in jobs]
+
+        for key, interface in zip(keys, results):
+            if interface is not None:
+                self._set('entries', key, interface)
+        if stats is not None:
+            stats.count('interface_misses', len(jobs))
+        return len(jobs)
+
+    def is_modified(self, filename):
+        """
+        Return whether the contents of an interface file changed since it was
+        last parsed, or whether it was never parsed or can not be read. A
+        file that was only touched is not modified.
+
+        :param str filename: The absolute path to the interface file
+        :rtype: bool
+        """
+        cached = self.files.get(filename)
+        stamp = _stamp(filename)
+        if cached is None or stamp is None:
+            return True
+        if cached[0] == stamp:
+            return False
+        try:
+            with io.open(filename, 'rb') as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+        except (IOError, OSError):
+            return True
+        return digest != cached[1][2]
+
+    def _read(self, filename, kind, force=False, stale=None):
+        """
+        Return the cache key of an interface file and, if the file had to be
+        read because it was modified since it was last parsed, its contents.
+        The entry of the previous contents of the file is removed if no other
+        file has it, or, if ``stale`` is given, its key is added to the set
+        for the caller to pass to _evict() once all files are read.
+        """
+        stamp = _stamp(filename)
+        syntax = interface_syntax(filename)
+        cached = self.files.get(filename)
+        if not force and stamp is not None and cached is not None and \
+                cached[0] == stamp and cached[1][:2] == (kind, syntax):
+            return cached[1], None
+
+        with io.open(filename, 'rb') as f:
+            data = f.read()
+        key = (kind, syntax, hashlib.sha1(data).hexdigest())
+
+        old_key = cached and cached[1]
+        self._set('files', filename, (stamp, key))
+        if old_key and old_key != key:
+            if stale is None:
+                self._evict((old_key,))
+            else:
+                stale.add(old_key)
+        return key, data
+
+    def _evict(self, keys):
+        """
+        Remove the entries of the given keys that no file has any more.
+        """
+        used = set(key for _, key in self.files.values())
+        for key in keys:
+            if key not in used:
+                self.entries.pop(key, None)
+
+    def scan_package(self, path, stats=None):
+        """
+        Read the ``package.xml`` file of the package in ``path`` and discover
+        its interface files. Packages whose manifest and interface
+        directories were not modified since the last scan are not scanned
+        again.
+
+        :param str path: The absolute path to the package directory
+        :param stats: The statistics of the build to count cache hits in
+        :type stats: sphinx_ros.stats.BuildStats
+        :return: The package description and the sorted list of ``(kind,
+                 filename)`` tuples of its interface files.
+        :rtype: PackageInfo
+        """
+        manifest = os.path.join(path, 'package.xml')
+        stamps = _package_stamps(path)
+        cached = self.packages.get(path)
+        if cached is not None and cached[0] == stamps:
+            if stats is not None:
+                stats.count('package_hits')
+            return cached[1]
+
+        if stats is not None:
+            stats.count('package_misses')
+
+        with io.open(manifest, 'rb') as f:
+            info = parse_package_xml(f.read())
+        for kind in interface_kinds:
+            directory = os.path.join(path, kind)
+            if not os.path.isdir(directory):
+                continue
+            for filename in _interface_files(kind,
+                                             sorted(os.listdir(directory))):
+                info.interfaces.append((kind,
+                                        os.path.join(directory, filename)))
+        self._set('packages', path, (stamps, info))
+        return info
+
+    def is_package_modified(self, path):
+        """
+        Return whether the manifest or the interface directories of a package
+        were modified since it was last scanned, e.g. because interface files
+        were added or removed, or whether it was never scanned.
+
+        :param str path: The absolute path to the package directory
+        :rtype: bool
+        """
+        cached = self.packages.get(path)
+        return cached is None or cached[0] != _package_stamps(path)
+
+    def find_packages(self, path, stats=None):
+        """
+        Find the packages, i.e. the directories with a ``package.xml`` file,
+        below a directory, e.g. the ``share`` directory of an install space.
+        Packages are not searched for nested packages. The directories are
+        only searched again when one of them was modified, i.e. a package was
+        added or removed.
+
+        :param str path: The absolute path to the directory
+        :param stats: The statistics of the build to count cache hits in
+        :type stats: sphinx_ros.stats.BuildStats
+        :return: The absolute paths to the package directories, sorted.
+        :rtype: list
+        """
+        cached = self.roots.get(path)
+        if cached is not None and all(_stamp(dirpath) == stamp
+                                      for dirpath, stamp in cached[0]):
+            if stats is not None:
+                stats.count('package_hits')
+            return cached[1]
+
+        if stats is not None:
+            stats.count('package_misses')
+        stamps = []
+        packages = []
+        for dirpath, dirnames, files in os.walk(path):
+            if 'package.xml' in files:
+                packages.append(dirpath)
+                dirnames[:] = []
+                continue
+            stamps.append((dirpath, _stamp(dirpath)))
+            if ignore_markers.intersection(files):
+                dirnames[:] = []
+                continue
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        packages.sort()
+        self._set('roots', path, (stamps, packages))
+        return packages
+
+    def _set(self, table, key, value):
+        """
+        Set an entry of one of the tables ``entries``, ``files``,
+        ``packages``, and ``roots``, and of the same table of
+        :attr:`changes` if set.
+        """
+        getattr(self, table)[key] = value
+        if self.changes is not None:
+            getattr(self.changes, table)[key] = value
+
+    def merge(self, other):
+        """
+        Merge the entries of another cache, e.g. the entries set by a
+        parallel reader.
+        """
+        self.entries.update(other.entries)
+        self.files.update(other.files)
+        self.packages.update(other.packages)
+        self.roots.update(other.roots)
+
+
+def _parse_job(job):
+    """
+    Parse the contents of an interface file in a worker process, returning
+    ``None`` if it can not be parsed.
+    """
+    kind, syntax, data = job
+    try:
+        return interface_parsers[syntax](data.decode('utf-8'), kind)
+    except (InterfaceParseError, UnicodeError):
+        return None
+
+
+def find_interface_files(paths):
+    """
+    Find the interface files, including ``.idl`` files, in the ``msg``,
+    ``srv``, and ``action`` directories below the given directories.
+    Hidden directories and directories with a ``CATKIN_IGNORE``,
+    ``COLCON_IGNORE``, or ``AMENT_IGNORE`` file are skipped.
+
+    :param paths: The absolute paths to the directories to search
+    :return: The absolute paths to the interface files, sorted.
+    :rtype: list
+    """
+    filenames = []
+    for path in paths:
+        for dirpath, dirnames, files in os.walk(path):
+            if ignore_markers.intersection(files):
+                dirnames[:] = []
+                continue
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            kind = os.path.basename(dirpath)
+            if kind in interface_kinds:
+                filenames.extend(os.path.join(dirpath, f)
+                                 for f in _interface_files(kind, files))
+    return sorted(filenames)
+
+
+def parse_interface_files(app, env, docnames):
+    """
+    Handler for the ``env-before-read-docs`` event, parsing the interface
+    files found in :confval:`ros_interface_paths` in a pool of
+    :confval:`ros_parse_workers` processes before any document is read, so
+    that the directives find them in the interface cache. This happens after
+    find_outdated_docs() compared the files with the cache.
+    """
+    paths = [os.path.normpath(os.path.join(app.confdir, path))
+             for path in app.config.ros_interface_paths]
+    if not paths:
+        return
+    workers = app.config.ros_parse_workers
+    if workers is None:
+        import multiprocessing
+        workers = multiprocessing.cpu_count()
+    workers = int(workers)  # a string if overridden with -D
+    filenames = find_interface_files(paths)
+    parsed = get_interface_cache(app.env).parse_all(
+        filenames, workers, stats=get_build_stats(app.env))
+    if parsed:
+        logger.info('parsed %d of %d ROS interface files', parsed,
+                    len(filenames))
+
+
+def find_outdated_docs(app, env, added, changed, removed):
+    """
+    Handler for the ``env-get-outdated`` event. The documents describing
+    types from interface files are read again when the files are modified,
+    since they are noted as dependencies. If the contents of a file changed,
+    the documents referencing the types described from it are read again as
+    well. The documents describing packages with ros:autopackage are read
+    again when interface files are added to or removed from the packages.
+    """
+    env = app.env  # Sphinx 1.8 passes the builder instead
+    domain = env.get_domain('ros')
+    cache = get_interface_cache(env)
+    rescanned = set()
+    for docname, paths in domain.get_autopackages():
+        if docname in changed or docname in removed:
+            continue
+        for path in paths:
+            if cache.is_package_modified(
+                    os.path.abspath(os.path.join(env.srcdir, path))):
+                rescanned.add(docname)
+                break
+    if rescanned:
+        logger.verbose('%d documents describe packages with added or '
+                       'removed ROS interface files', len(rescanned))
+
+    modified = {}
+    types = set()
+    for docname in changed:
+        for filename, fullname in domain.get_sources(docname):
+            if filename not in modified:
+                modified[filename] = cache.is_modified(
+                    os.path.abspath(os.path.join(env.srcdir, filename)))
+            if modified[filename]:
+                types.add(fullname)
+    if not types:
+        return rescanned
+    outdated = domain.get_referencing_docs(types) - changed - removed
+    if outdated:
+        logger.verbose('%d documents reference the modified ROS types',
+                       len(outdated))
+    return outdated | rescanned
+
+
+def get_interface_cache(env):
+    """
+    Return the interface cache of the build, creating it if needed. The cache
+    is kept by the application rather than the build environment, since it
+    is saved on its own by save_interface_cache() and would otherwise be
+    pickled with the environment as well.
+
+    A parallel reader process starts with a copy of the cache of the main
+    process. The entries it sets are also set in an empty cache attached to
+    the environment the reader sends back, so that only those are pickled
+    and merged by merge_interface_cache().
+
+    :param env: The build environment
+    :type env: sphinx.environment.BuildEnvironment
+    :rtype: InterfaceCache
+    """
+    app = env.app
+    cache = getattr(app, 'ros_interface_cache', None)
+    if cache is None:
+        cache = app.ros_interface_cache = InterfaceCache()
+    reader = getattr(app, 'ros_interface_reader', None)
+    if reader is not None and reader != os.getpid() and \
+            cache.changes is None:
+        cache.changes = env.ros_interface_cache = InterfaceCache()
+    return cache
+
+
+def _cache_filename(app):
+    return os.path.join(app.doctreedir, 'ros_interfaces.pickle')
+
+
+def load_interface_cache(app):
+    """
+    Handler for the ``builder-inited`` event, loading the interface cache
+    saved by a previous build.
+    """
+    if getattr(app, 'ros_interface_cache', None) is not None:
+        return
+    try:
+        with open(_cache_filename(app), 'rb') as f:
+            version, cache = pickle.load(f)
+    except (IOError, OSError):
+        return
+    except Exception as exc:
+        logger.info('failed to load the ROS interface cache: %s', exc)
+        return
+    if version == InterfaceCache.version:
+        app.ros_interface_cache = cache
+
+
+def save_interface_cache(app, exception):
+    """
+    Handler for the ``build-finished`` event, saving the interface cache for
+    the next build.
+    """
+    cache = getattr(app, 'ros_interface_cache', None)
+    if exception is not None or cache is None:
+        return
+    try:
+        with open(_cache_filename(app), 'wb') as f:
+            pickle.dump((InterfaceCache.version, cache), f,
+                        pickle.HIGHEST_PROTOCOL)
+    except (IOError, OSError) as exc:
+        logger.warning('failed to save the ROS interface cache: %s', exc)
+
+
+def attach_interface_cache(app, env, docnames):
+    """
+    Handler for the ``env-before-read-docs`` event, noting the process that
+    reads the documents, so that the parallel readers forked from it send the
+    files they parse back with their environment, see get_interface_cache().
+    """
+    app.ros_interface_reader = os.getpid()
+
+
+def detach_interface_cache(app, env):
+    """
+    Handler for the ``env-updated`` event, ending the reading of the
+    documents started by attach_interface_cache(), so that parallel writers
+    do not attach the entries they set to the environment.
+    """
+    app.ros_interface_reader = None
+
+
+def merge_interface_cache(app, env, docnames, other):
+    """
+    Handler for the ``env-merge-info`` event, merging the entries a parallel
+    reader set in the interface cache.
+    """
+    other_cache = getattr(other, 'ros_interface_cache', None)
+    if other_cache is not None:
+        get_interface_cache(env).merge(other_cache)
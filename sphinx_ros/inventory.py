@@ -0,0 +1,258 @@
+"""
+``sphinx_ros.inventory`` module
+===============================
+
+This module loads inventories of ROS types that are documented elsewhere, e.g.
+the standard message packages, from local files. The inventories are listed
+in :confval:`ros_type_inventories` and are loaded into a single lookup table
+once per build, so references to external types are resolved without network
+access.
+
+With :confval:`ros_system_interfaces`, the interface files of the packages
+installed in ``AMENT_PREFIX_PATH`` and ``ROS_PACKAGE_PATH`` are indexed as
+well, so that references to them are validated and the hashes and sizes of
+the messages using them are computed from their definitions.
+"""
+
+import io
+import os
+import posixpath
+
+from six import iterkeys
+from sphinx.util import logging
+from sphinx.util.inventory import InventoryFile
+from .interfaces import get_interface_cache, InterfaceParseError
+from .stats import count, get_build_stats
+
+logger = logging.getLogger(__name__)
+
+
+#: Object types of inventories written by Sphinx that describe ROS types.
+inventory_objtypes = {
+    'ros:package': None,
+    'ros:message': 'msg',
+    'ros:service': 'srv',
+    'ros:action': 'action',
+}
+
+#: role -> interface kinds that can be referenced with it
+role_kinds = {
+    'msg': ('msg',),
+    'srv': ('srv',),
+    'act': ('action',),
+}
+
+
+class TypeInventory(object):
+    """
+    Lookup table of external ROS types, keyed on the full name of the type,
+    e.g. ``'std_msgs.msg.Header'``, or on the name of a package.
+    """
+
+    def __init__(self, key=None):
+        #: The configured inventories and their modification times.
+        self.key = key
+        #: fullname -> (uri, title), the URI is ``None`` for installed types
+        self.types = {}
+        #: fullname -> (file name, modification time) of the interface files
+        #: of installed types
+        self.files = {}
+
+    def __len__(self):
+        return len(self.types)
+
+    def add(self, fullname, uri, title):
+        self.types.setdefault(fullname, (uri, title))
+
+    def add_file(self, fullname, filename):
+        """
+        Add an installed type, unless a type of the same name was added
+        before, e.g. from a package of an overlay workspace.
+        """
+        if fullname in self.files:
+            return
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError:
+            return
+        self.files[fullname] = (filename, mtime)
+        self.add(fullname, None, '(installed)')
+
+    def lookup(self, target, role=None):
+        """
+        Find an external ROS type or package.
+
+        :param str target: The target, e.g. ``'std_msgs/Header'``,
+                           ``'std_msgs.msg.Header'``, ``'Header'``, or
+                           ``'std_msgs'``
+        :param str role: The role used to reference the target, used to
+                         complete targets without interface kind
+        :return: The full name, URI and title of the type, or ``None``.
+        :rtype: tuple
+        """
+        if target == 'Header':
+            target = 'std_msgs/Header'
+        parts = target.replace('/', '.').split('.')
+        if len(parts) == 2:
+            candidates = ['.'.join([parts[0], kind, parts[1]])
+                          for kind in role_kinds.get(role,
+                                                     ('msg', 'srv', 'action'))]
+        else:
+            candidates = ['.'.join(parts)]
+        for fullname in candidates:
+            if fullname in self.types:
+                return (fullname,) + self.types[fullname]
+        return None
+
+    def load_sphinx_inventory(self, stream, uri):
+        """
+        Add the ROS types of an ``objects.inv`` file written by Sphinx.
+        """
+        invdata = InventoryFile.load(stream, uri, posixpath.join)
+        for objtype in inventory_objtypes:
+            for name, (proj, version, location, _) in \
+                    invdata.get(objtype, {}).items():
+                title = version and '(in %s v%s)' % (proj, version) or \
+                    '(in %s)' % proj
+                self.add(name, location, title)
+
+    def load_type_list(self, stream, uri, distro):
+        """
+        Add the ROS types of a type list, a text file with a type per line
+        written as ``package/Type`` (a message) or ``package/kind/Type``. The
+        URI is a template that is formatted with the ``package``, ``kind``,
+        ``name``, and ``distro`` of each type.
+        """
+        for line in stream:
+            line = line.decode('utf-8').split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split('/')
+            if len(parts) == 2:
+                parts.insert(1, 'msg')
+            if len(parts) != 3:
+                logger.warning('invalid ROS type %r in type list', line)
+                continue
+            package, kind, name = parts
+            self.add('.'.join(parts),
+                     uri.format(package=package, kind=kind, name=name,
+                                distro=distro),
+                     '(in ROS %s)' % distro)
+
+
+def load_type_inventories(app):
+    """
+    Handler for the ``builder-inited`` event, loading the inventories listed
+    in :confval:`ros_type_inventories`. An entry may give the distribution
+    its type list is formatted with, which defaults to
+    :confval:`ros_msg_reference_version`. The table of the previous build is
+    reused when neither the configuration nor the files changed. Otherwise,
+    the documents referencing types that were added, removed, or moved are
+    written again.
+    """
+    env = app.env
+    inventories = []
+    for entry in app.config.ros_type_inventories:
+        uri, filename = entry[:2]
+        distro = len(entry) > 2 and entry[2] or \
+            app.config.ros_msg_reference_version
+        filename = os.path.join(app.confdir, filename)
+        try:
+            mtime = os.path.getmtime(filename)
+        except OSError:
+            mtime = None
+        inventories.append((uri, filename, distro, mtime))
+    key = tuple(inventories)
+
+    previous = getattr(env, 'ros_type_inventory', None)
+    if previous is not None and previous.key == key:
+        return
+
+    count(env, 'type_inventory_reloads')
+    inventory = TypeInventory(key)
+    for uri, filename, distro, _ in inventories:
+        try:
+            with io.open(filename, 'rb') as stream:
+                if stream.readline().startswith(b'# Sphinx inventory'):
+                    stream.seek(0)
+                    inventory.load_sphinx_inventory(stream, uri)
+                else:
+                    stream.seek(0)
+                    inventory.load_type_list(stream, uri, distro)
+        except Exception as exc:
+            logger.warning('failed to read ROS type inventory %r: %s',
+                           filename, exc)
+    if previous is not None:
+        # Write the documents referencing the changed types again
+        env.get_domain('ros').note_external_changes(
+            fullname for fullname in set(iterkeys(previous.types)) |
+            set(iterkeys(inventory.types))
+            if previous.types.get(fullname) != inventory.types.get(fullname))
+    env.ros_type_inventory = inventory
+
+
+def system_interface_paths(environ=None):
+    """
+    Return the directories to search for installed packages, in the order of
+    precedence: the ``share`` directories of the prefixes in
+    ``AMENT_PREFIX_PATH`` and the directories in ``ROS_PACKAGE_PATH``.
+
+    :param dict environ: The environment variables, defaults to
+                         ``os.environ``
+    :rtype: list
+    """
+    if environ is None:
+        environ = os.environ
+    paths = [os.path.join(prefix, 'share') for prefix
+             in environ.get('AMENT_PREFIX_PATH', '').split(os.pathsep)
+             if prefix]
+    paths.extend(path for path
+                 in environ.get('ROS_PACKAGE_PATH', '').split(os.pathsep)
+                 if path)
+    result = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if path not in result and os.path.isdir(path):
+            result.append(path)
+    return result
+
+
+def load_system_interfaces(app):
+    """
+    Handler for the ``builder-inited`` event, indexing the interface files of
+    the packages installed in ``AMENT_PREFIX_PATH`` and ``ROS_PACKAGE_PATH``
+    if :confval:`ros_system_interfaces` is set. The directories and packages
+    are searched with the interface cache, which is saved between builds, so
+    only directories that were modified since are searched again.
+    """
+    env = app.env
+    previous = getattr(env, 'ros_system_interfaces', None)
+    if not app.config.ros_system_interfaces:
+        env.ros_system_interfaces = None
+        return
+
+    cache = get_interface_cache(env)
+    stats = get_build_stats(env)
+    paths = system_interface_paths()
+    inventory = TypeInventory(tuple(paths))
+    for path in paths:
+        for package in cache.find_packages(path, stats):
+            try:
+                info = cache.scan_package(package, stats)
+            except (IOError, OSError, InterfaceParseError) as exc:
+                logger.verbose('skipped installed package %r: %s', package,
+                               exc)
+                continue
+            for kind, filename in info.interfaces:
+                name = os.path.splitext(os.path.basename(filename))[0]
+                inventory.add_file('.'.join([info.name, kind, name]),
+                                   filename)
+    if previous is not None:
+        # Write the documents referencing the changed types again
+        env.get_domain('ros').note_external_changes(
+            fullname for fullname in set(iterkeys(previous.files)) |
+            set(iterkeys(inventory.files))
+            if previous.files.get(fullname) != inventory.files.get(fullname))
+    env.ros_system_interfaces = inventory
+    logger.verbose('%d installed ROS types found in %d directories',
+                   len(inventory.files), len(paths))
@@ -0,0 +1,62 @@
+"""
+``sphinx_ros.references`` module
+================================
+
+This module resolves the ROS cross-references of a document in a single pass
+before Sphinx resolves the remaining ones. The references are grouped by what
+their resolution depends on, see :meth:`~sphinx_ros.domain.RosDomain.xref_key`,
+so that every distinct target is resolved, and its URI computed, once per
+document, however often it is referenced, and the result is used for all the
+references to it. References that can not be resolved are left to Sphinx,
+which warns about them and emits the ``missing-reference`` event.
+"""
+
+import collections
+
+from six import iteritems
+from sphinx import addnodes
+from sphinx.transforms import SphinxTransform
+from .stats import get_build_stats
+
+
+class RosReferencesResolver(SphinxTransform):
+    """
+    Post-transform resolving the ROS cross-references of a document, target
+    by target.
+    """
+
+    # before sphinx.transforms.post_transforms.ReferencesResolver
+    default_priority = 9
+
+    def apply(self):
+        domain = self.env.get_domain('ros')
+        # xref key -> pending cross-references, in document order
+        pending = collections.OrderedDict()
+        for node in self.document.traverse(addnodes.pending_xref):
+            if node.get('refdomain') == 'ros':
+                pending.setdefault(domain.xref_key(node), []).append(node)
+        if not pending:
+            return
+
+        builder = self.app.builder
+        resolved_count = 0
+        for key, xrefs in iteritems(pending):
+            resolved = domain.resolve_xref_key(self.env, key)
+            if resolved is None:
+                continue
+            # refdoc -> attributes of the reference nodes
+            attributes = {}
+            for node in xrefs:
+                refdoc = node.get('refdoc', self.env.docname)
+                if refdoc not in attributes:
+                    attributes[refdoc] = domain.xref_attributes(
+                        builder, refdoc, resolved)
+                # The pending node is dropped, so its content is reused
+                node.replace_self(domain.make_xref_node(
+                    resolved, node, node[0], attributes[refdoc]))
+            resolved_count += len(xrefs)
+
+        stats = get_build_stats(self.env)
+        if stats is not None:
+            stats.count('resolve_xref_targets', len(pending))
+            stats.count('resolve_xref_batched', resolved_count)
@@ -0,0 +1,72 @@
+"""
+``sphinx_ros.search`` module
+============================
+
+This module adds the fields and constants of the documented ROS types to the
+objects of the HTML search index. They are not returned by
+:meth:`sphinx_ros.domain.RosDomain.get_objects`, since Sphinx also writes
+those to ``objects.inv``, where the fields would make up most of the
+inventory without being the target of any role.
+"""
+
+try:
+    from html import escape
+except ImportError:
+    from cgi import escape
+
+from six import itervalues
+from sphinx.search import IndexBuilder
+
+
+class RosIndexBuilder(IndexBuilder):
+    """
+    Search index builder that also indexes the fields and constants, see
+    :meth:`sphinx_ros.domain.RosDomain.get_field_objects`.
+
+    A field is stored under the name of its type, e.g. ``foo_pkg.msg.Foo``
+    for ``foo_pkg.msg.Foo.header``, with the name as anchor. Its description
+    in the search results is made of the field type and the first line of
+    its comment, e.g. ``Header field: Standard metadata``; fields with the
+    same description share it in the index.
+    """
+
+    #: search priority of the fields, below the packages (0) and types (1)
+    field_priority = 2
+
+    def get_objects(self, fn2index):
+        objects = super(RosIndexBuilder, self).get_objects(fn2index)
+        # Newer Sphinx versions store lists of objects per name prefix
+        listed = any(isinstance(entries, list)
+                     for entries in itervalues(objects))
+        domain = self.env.get_domain('ros')
+        for fullname, type, docname, field_type, comment in \
+                sorted(domain.get_field_objects()):
+            if docname not in fn2index:
+                continue
+            description = u'{} {}'.format(
+                field_type, domain.object_types[type].lname)
+            if comment:
+                description += u': ' + comment
+            key = ('ros', type, description)
+            typeindex = self._objtypes.get(key)
+            if typeindex is None:
+                typeindex = self._objtypes[key] = len(self._objtypes)
+                self._objnames[typeindex] = ('ros', type, escape(description))
+            prefix, _, name = escape(fullname).rpartition('.')
+            entry = (fn2index[docname], typeindex, self.field_priority, '')
+            if listed:
+                objects.setdefault(prefix, []).append(entry + (name,))
+            else:
+                objects.setdefault(prefix, {})[name] = entry
+        return objects
+
+
+def add_field_objects(app, pagename, templatename, context, doctree):
+    """
+    Makes the search index of an HTML builder a :class:`RosIndexBuilder`.
+    The index is made by the builder before writing the pages, and dumped
+    after the last page, the search page, is written.
+    """
+    indexer = getattr(app.builder, 'indexer', None)
+    if type(indexer) is IndexBuilder:
+        indexer.__class__ = RosIndexBuilder
@@ -0,0 +1,238 @@
+/*
+ * ros_type_finder.js
+ * ~~~~~~~~~~~~~~~~~~
+ *
+ * Type finder of sphinx_ros: searches the ROS type catalog written by
+ * sphinx_ros.catalog for the ros:typefinder search boxes. The catalog index
+ * and the shards of the packages are loaded once, when a search box is first
+ * used, and types are found by prefix or, failing that, by the letters of
+ * the query in order.
+ */
+
+(function () {
+  'use strict';
+
+  var CATALOG_DIR = '_ros/';
+  var CATALOG_INDEX = 'types.json';
+  var CATALOG_VERSION = 1;
+  var MAX_RESULTS = 20;
+  var MAX_FIELDS = 8;
+
+  // The types of the catalog, loaded by loadCatalog()
+  var types = null;
+  var pending = null;
+
+  function urlRoot() {
+    var root = document.documentElement.getAttribute('data-content_root');
+    if (root === null && window.DOCUMENTATION_OPTIONS) {
+      root = DOCUMENTATION_OPTIONS.URL_ROOT;
+    }
+    return root || '';
+  }
+
+  function getJSON(url, callback) {
+    var request = new XMLHttpRequest();
+    request.onreadystatechange = function () {
+      if (request.readyState !== 4) {
+        return;
+      }
+      var data = null;
+      if (request.status === 200 || request.status === 0) {
+        try {
+          data = JSON.parse(request.responseText);
+        } catch (e) {
+          data = null;
+        }
+      }
+      callback(data);
+    };
+    request.open('GET', url, true);
+    request.send();
+  }
+
+  function addShard(shard) {
+    var i, type, fullname;
+    for (i = 0; i < shard.types.length; i++) {
+      type = shard.types[i];
+      fullname = shard.package ? shard.package + '/' + type[0] : type[0];
+      types.push({
+        name: type[0],
+        lname: type[0].toLowerCase(),
+        fullname: fullname,
+        lfullname: fullname.toLowerCase(),
+        lpath: (shard.package + '/' + type[1] + '/' + type[0]).toLowerCase(),
+        kind: type[1],
+        uri: type[2],
+        fields: type[3]
+      });
+    }
+  }
+
+  function loadCatalog(callback) {
+    if (types !== null) {
+      callback();
+      return;
+    }
+    if (pending !== null) {
+      pending.push(callback);
+      return;
+    }
+    pending = [callback];
+    var root = urlRoot();
+    getJSON(root + CATALOG_DIR + CATALOG_INDEX, function (index) {
+      var loaded = [];
+      var remaining;
+      function done() {
+        var callbacks = pending;
+        types = [];
+        loaded.forEach(function (shard) {
+          if (shard) {
+            addShard(shard);
+          }
+        });
+        pending = null;
+        callbacks.forEach(function (f) { f(); });
+      }
+      if (!index || index.version !== CATALOG_VERSION) {
+        done();
+        return;
+      }
+      remaining = index.packages.length;
+      if (remaining === 0) {
+        done();
+        return;
+      }
+      index.packages.forEach(function (entry, i) {
+        getJSON(root + CATALOG_DIR + entry[1], function (shard) {
+          loaded[i] = shard;
+          remaining -= 1;
+          if (remaining === 0) {
+            done();
+          }
+        });
+      });
+    });
+  }
+
+  // Score of the letters of the query in order in the name, or -1
+  function fuzzyScore(query, name) {
+    var score = 0;
+    var last = -1;
+    var i, pos;
+    for (i = 0; i < query.length; i++) {
+      pos = name.indexOf(query.charAt(i), last + 1);
+      if (pos < 0) {
+        return -1;
+      }
+      score += pos - last - 1;
+      last = pos;
+    }
+    return score;
+  }
+
+  // Lower is better: exact, prefix, substring, then fuzzy matches of the
+  // short name before those of the full name
+  function score(query, type) {
+    if (type.lname === query || type.lfullname === query ||
+        type.lpath === query) {
+      return 0;
+    }
+    if (type.lname.indexOf(query) === 0) {
+      return 1;
+    }
+    if (type.lfullname.indexOf(query) === 0 ||
+        type.lpath.indexOf(query) === 0) {
+      return 2;
+    }
+    if (type.lfullname.indexOf(query) > 0 || type.lpath.indexOf(query) > 0) {
+      return 3;
+    }
+    var fuzzy = fuzzyScore(query, type.lname);
+    if (fuzzy >= 0) {
+      return 4 + fuzzy;
+    }
+    fuzzy = fuzzyScore(query, type.lfullname);
+    return fuzzy < 0 ? -1 : 1000 + fuzzy;
+  }
+
+  function find(query) {
+    var results = [];
+    query = query.replace(/\s+/g, '').replace(/\./g, '/').toLowerCase();
+    if (!query) {
+      return results;
+    }
+    types.forEach(function (type) {
+      var s = score(query, type);
+      if (s >= 0) {
+        results.push([s, type]);
+      }
+    });
+    results.sort(function (a, b) {
+      return a[0] - b[0] || a[1].name.length - b[1].name.length ||
+        (a[1].lfullname < b[1].lfullname ? -1 : 1);
+    });
+    return results.slice(0, MAX_RESULTS).map(function (result) {
+      return result[1];
+    });
+  }
+
+  function renderResult(type, root) {
+    var item = document.createElement('li');
+    var link = document.createElement('a');
+    var code = document.createElement('code');
+    code.className = 'xref';
+    code.appendChild(document.createTextNode(type.fullname));
+    link.href = root + type.uri;
+    link.appendChild(code);
+    item.appendChild(link);
+    item.appendChild(document.createTextNode(' (' + type.kind + ')'));
+    if (type.fields.length) {
+      var fields = type.fields.slice(0, MAX_FIELDS).map(function (field) {
+        var text = (field[1] ? field[1] + ' ' : '') + field[0];
+        return field.length > 2 ? text + '=' + field[2] : text;
+      });
+      if (type.fields.length > MAX_FIELDS) {
+        fields.push('...');
+      }
+      var details = document.createElement('div');
+      details.className = 'ros-typefinder-fields';
+      details.appendChild(document.createTextNode(fields.join(', ')));
+      item.appendChild(details);
+    }
+    return item;
+  }
+
+  function update(input, list) {
+    var root = urlRoot();
+    while (list.firstChild) {
+      list.removeChild(list.firstChild);
+    }
+    find(input.value).forEach(function (type) {
+      list.appendChild(renderResult(type, root));
+    });
+  }
+
+  function init(finder) {
+    var input = finder.getElementsByTagName('input')[0];
+    var list = finder.getElementsByTagName('ul')[0];
+    input.addEventListener('focus', function () {
+      loadCatalog(function () {});
+    });
+    input.addEventListener('input', function () {
+      loadCatalog(function () { update(input, list); });
+    });
+  }
+
+  function initAll() {
+    var finders = document.querySelectorAll('.ros-typefinder');
+    for (var i = 0; i < finders.length; i++) {
+      init(finders[i]);
+    }
+  }
+
+  if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', initAll);
+  } else {
+    initAll();
+  }
+})();
@@ -0,0 +1,236 @@
+"""
+``sphinx_ros.stats`` module
+===========================
+
+This module records statistics of a build when
+:confval:`ros_build_stats` is set: the time spent in the ROS directives per
+document and per directive, the cross-reference resolution, the hit rates of
+the caches, and the size of the domain data. The statistics are written as
+JSON when the build is finished.
+"""
+
+import collections
+import functools
+import json
+import os
+import time
+
+from six import iteritems
+from six.moves import cPickle as pickle
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BuildStats(object):
+    """
+    Statistics of a single build.
+    """
+
+    def __init__(self):
+        #: The process recording the statistics, see get_build_stats()
+        self.pid = os.getpid()
+        #: (phase, docname, directive) -> [calls, seconds]
+        self.timings = {}
+        #: name -> count
+        self.counters = collections.Counter()
+        #: target -> number of unresolved references
+        self.unresolved = collections.Counter()
+        #: build stage -> time stamp
+        self.stamps = {}
+
+    def add_time(self, phase, docname, directive, seconds):
+        timing = self.timings.setdefault((phase, docname, directive), [0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def note_unresolved(self, target):
+        self.unresolved[target] += 1
+
+    def stamp(self, stage):
+        self.stamps.setdefault(stage, time.time())
+
+    def merge(self, other):
+        """
+        Merge the statistics of a parallel reader.
+        """
+        for key, (calls, seconds) in iteritems(other.timings):
+            timing = self.timings.setdefault(key, [0, 0.0])
+            timing[0] += calls
+            timing[1] += seconds
+        self.counters.update(other.counters)
+        self.unresolved.update(other.unresolved)
+
+    def _totals(self, key_index):
+        totals = {}
+        for key, (calls, seconds) in iteritems(self.timings):
+            total = totals.setdefault(key[key_index], {'calls': 0,
+                                                       'seconds': 0.0})
+            total['calls'] += calls
+            total['seconds'] += seconds
+        return totals
+
+    def as_dict(self, env):
+        """
+        Return the statistics as a dictionary that can be written as JSON.
+        """
+        stamps = self.stamps
+        stages = {}
+        if 'read_start' in stamps and 'read_end' in stamps:
+            stages['read'] = stamps['read_end'] - stamps['read_start']
+        if 'read_end' in stamps and 'finished' in stamps:
+            stages['write'] = stamps['finished'] - stamps['read_end']
+        if 'inited' in stamps and 'finished' in stamps:
+            stages['total'] = stamps['finished'] - stamps['inited']
+
+        documents = sorted(iteritems(self._totals(1)),
+                           key=lambda x: -x[1]['seconds'])
+        documents = [dict(docname=docname, **totals)
+                     for docname, totals in documents]
+        counters = self.counters
+
+        def cache(hits, misses):
+            total = counters[hits] + counters[misses]
+            return {'hits': counters[hits], 'misses': counters[misses],
+                    'hit_rate': total and float(counters[hits]) / total}
+
+        data = env.get_domain('ros').data
+        return {
+            'stages': stages,
+            'phases': self._totals(0),
+            'directives': self._totals(2),
+            'documents': documents,
+            'resolve_xref': {
+                'calls': counters['resolve_xref'],
+                'batched': counters['resolve_xref_batched'],
+                'batched_targets': counters['resolve_xref_targets'],
+                'unresolved': sum(self.unresolved.values()),
+                'unresolved_targets': dict(self.unresolved),
+            },
+            'caches': {
+                'interface_files': cache('interface_hits',
+                                         'interface_misses'),
+                'packages': cache('package_hits', 'package_misses'),
+                'index_letters': cache('index_hits', 'index_misses'),
+                'resolve_xref': cache('resolve_cache_hits',
+                                      'resolve_cache_misses'),
+                'type_hashes': cache('type_hash_hits', 'type_hash_misses'),
+                'type_sizes': cache('type_size_hits', 'type_size_misses'),
+                'type_inventory_reloads': counters['type_inventory_reloads'],
+            },
+            'domain_data': {
+                'entries': dict((key, len(value)) for key, value in
+                                iteritems(data) if isinstance(value, dict)),
+                'pickled_bytes': len(pickle.dumps(data,
+                                                  pickle.HIGHEST_PROTOCOL)),
+            },
+        }
+
+
+def get_build_stats(env):
+    """
+    Return the statistics of the current build, or ``None`` if
+    :confval:`ros_build_stats` is not set. The statistics are kept by the
+    application, so that they are not pickled with the environment.
+
+    A parallel reader process starts with a copy of the statistics of the
+    main process, so it gets empty statistics of its own instead. They are
+    attached to the environment the reader sends back, and added to those of
+    the main process by merge_build_stats().
+
+    :rtype: BuildStats
+    """
+    app = env.app
+    stats = getattr(app, 'ros_build_stats', None)
+    if stats is not None and stats.pid != os.getpid():
+        stats = app.ros_build_stats = env.ros_build_stats = BuildStats()
+    return stats
+
+
+def count(env, name, n=1):
+    """
+    Increment a counter of the current build, if statistics are recorded.
+    """
+    stats = get_build_stats(env)
+    if stats is not None:
+        stats.count(name, n)
+
+
+def timed(phase):
+    """
+    Decorator for directive methods that records the time spent in them per
+    document and per directive, if statistics are recorded.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            stats = get_build_stats(self.env)
+            if stats is None:
+                return method(self, *args, **kwargs)
+            start = time.time()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                stats.add_time(phase, self.env.docname, self.name,
+                               time.time() - start)
+        return wrapper
+    return decorator
+
+
+def init_build_stats(app):
+    """
+    Handler for the ``builder-inited`` event, starting the statistics of the
+    build if :confval:`ros_build_stats` is set.
+    """
+    if app.config.ros_build_stats:
+        app.ros_build_stats = BuildStats()
+        app.ros_build_stats.stamp('inited')
+    else:
+        app.ros_build_stats = None
+
+
+def stamp_read_start(app, env, docnames):
+    stats = get_build_stats(env)
+    if stats is not None:
+        stats.stamp('read_start')
+
+
+def stamp_read_end(app, env):
+    stats = get_build_stats(env)
+    if stats is not None:
+        stats.stamp('read_end')
+
+
+def merge_build_stats(app, env, docnames, other):
+    """
+    Handler for the ``env-merge-info`` event, merging the statistics of a
+    parallel reader.
+    """
+    stats = get_build_stats(env)
+    # Only set by readers that recorded statistics, see get_build_stats()
+    other_stats = getattr(other, 'ros_build_stats', None)
+    if stats is not None and other_stats is not None:
+        stats.merge(other_stats)
+
+
+def write_build_stats(app, exception):
+    """
+    Handler for the ``build-finished`` event, writing the statistics to the
+    file given by :confval:`ros_build_stats`, relative to the output
+    directory.
+    """
+    stats = get_build_stats(app.env)
+    if stats is None or exception is not None:
+        return
+    stats.stamp('finished')
+    filename = os.path.join(app.outdir, app.config.ros_build_stats)
+    try:
+        with open(filename, 'w') as f:
+            json.dump(stats.as_dict(app.env), f, indent=2, sort_keys=True)
+    except (IOError, OSError) as exc:
+        logger.warning('failed to write the ROS build statistics: %s', exc)
+    else:
+        logger.info('ROS build statistics written to %s', filename)
@@ -0,0 +1,212 @@
+"""
+``sphinx_ros.typehash`` module
+==============================
+
+This module computes the hashes that identify the definition of a message
+type, i.e. the MD5 sum of ROS 1 and the RIHS01 type hash of ROS 2, from the
+fields and constants documented for it. Nested message types are expanded
+recursively and the results are memoized per type, so that every type is
+hashed once per build, however often it is nested.
+"""
+
+import collections
+import hashlib
+import json
+import re
+
+from .interfaces import split_array_type
+from .stats import count
+
+#: The primitive types of ROS 1 messages.
+ros1_builtins = ('bool', 'int8', 'uint8', 'int16', 'uint16', 'int32',
+                 'uint32', 'int64', 'uint64', 'float32', 'float64', 'string',
+                 'time', 'duration', 'byte', 'char')
+
+#: primitive type -> field type id of ``type_description_interfaces/FieldType``
+ros2_type_ids = {
+    'int8': 2,
+    'uint8': 3,
+    'int16': 4,
+    'uint16': 5,
+    'int32': 6,
+    'uint32': 7,
+    'int64': 8,
+    'uint64': 9,
+    'float32': 10,
+    'float64': 11,
+    'char': 3,  # an alias of uint8
+    'bool': 15,
+    'byte': 16,
+    'string': 17,
+    'wstring': 18,
+}
+#: bounded string type -> field type id
+ros2_bounded_string_ids = {'string': 21, 'wstring': 22}
+#: field type id of nested types
+ros2_nested_type_id = 1
+#: offset of the type id of arrays, bounded and unbounded sequences
+ros2_array_offsets = {'array': 48, 'bounded': 96, 'unbounded': 144}
+
+suffix_re = re.compile(r'^(?:<=(?P<string_capacity>\d+))?'
+                       r'(?:\[(?P<bounded><=)?(?P<capacity>\d*)\])?$')
+
+
+def ros2_type_name(fullname):
+    """
+    Return the ROS 2 name of a type, e.g. ``'foo_pkg/msg/Foo'``.
+    """
+    return fullname.replace('.', '/')
+
+
+class TypeHasher(object):
+    """
+    The memoized hashes of the message types of a ROS domain. Types that are
+    not documented, or have fields or constants that are not fully
+    documented, have no hash.
+
+    :param domain: The ROS domain
+    :type domain: sphinx_ros.domain.RosDomain
+    """
+
+    def __init__(self, domain):
+        self.domain = domain
+        #: fullname -> MD5 sum
+        self.md5sums = {}
+        #: fullname -> (type description, fullnames of the nested types)
+        self.descriptions = {}
+        #: fullname -> RIHS01 type hash
+        self.rihs01s = {}
+
+    def _memoized(self, memo, fullname, compute):
+        if fullname in memo:
+            count(self.domain.env, 'type_hash_hits')
+            return memo[fullname]
+        count(self.domain.env, 'type_hash_misses')
+        memo[fullname] = None  # guards against recursive definitions
+        memo[fullname] = compute(fullname)
+        return memo[fullname]
+
+    def md5sum(self, fullname):
+        """
+        Return the ROS 1 MD5 sum of a message type, as computed by
+        ``genmsg``, or ``None``.
+
+        :param str fullname: The full name of the message type
+        :rtype: str
+        """
+        return self._memoized(self.md5sums, fullname, self._md5sum)
+
+    def _md5sum(self, fullname):
+        definition = self.domain.get_message_definition(fullname)
+        if definition is None:
+            return None
+        constants, fields = definition
+        lines = []
+        for type_, name, value in constants:
+            if value is None:
+                return None
+            lines.append('{} {}={}'.format(type_, name, value))
+        for type_, name, ref in fields:
+            if split_array_type(type_)[0] in ros1_builtins:
+                lines.append('{} {}'.format(type_, name))
+                continue
+            nested = self.domain.resolve_field_type(ref)
+            md5sum = nested and self.md5sum(nested)
+            if not md5sum:
+                return None
+            lines.append('{} {}'.format(md5sum, name))
+        return hashlib.md5('\n'.join(lines).encode('utf-8')).hexdigest()
+
+    def rihs01(self, fullname):
+        """
+        Return the ROS 2 type hash of a message type, as computed by
+        ``rosidl_generator_type_description``, or ``None``.
+
+        :param str fullname: The full name of the message type
+        :rtype: str
+        """
+        return self._memoized(self.rihs01s, fullname, self._rihs01)
+
+    def _rihs01(self, fullname):
+        description = self.description(fullname)
+        if description is None:
+            return None
+        description, nested = description
+        referenced = sorted((self.descriptions[name][0] for name in nested),
+                            key=lambda x: x['type_name'])
+        data = collections.OrderedDict([
+            ('type_description', description),
+            ('referenced_type_descriptions', referenced),
+        ])
+        text = json.dumps(data, ensure_ascii=True, separators=(', ', ': '))
+        return 'RIHS01_' + hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def description(self, fullname):
+        """
+        Return the ROS 2 type description of a message type without default
+        values, and the full names of all the types nested in it, or
+        ``None``.
+
+        :param str fullname: The full name of the message type
+        :rtype: tuple
+        """
+        return self._memoized(self.descriptions, fullname, self._description)
+
+    def _description(self, fullname):
+        definition = self.domain.get_message_definition(fullname)
+        if definition is None:
+            return None
+        fields = []
+        nested = set()
+        for type_, name, ref in definition[1]:
+            field_type = self._field_type(type_, ref, nested)
+            if field_type is None:
+                return None
+            fields.append(collections.OrderedDict([('name', name),
+                                                   ('type', field_type)]))
+        if not fields:
+            fields.append(collections.OrderedDict([
+                ('name', 'structure_needs_at_least_one_member'),
+                ('type', self._field_type('uint8', None, nested)),
+            ]))
+        return collections.OrderedDict([
+            ('type_name', ros2_type_name(fullname)),
+            ('fields', fields),
+        ]), nested
+
+    def _field_type(self, type_, ref, nested):
+        base, suffix = split_array_type(type_)
+        m = suffix_re.match(suffix)
+        if m is None:
+            return None
+        string_capacity = m.group('string_capacity')
+        nested_type_name = ''
+        if string_capacity:
+            type_id = ros2_bounded_string_ids.get(base)
+        elif base in ros2_type_ids:
+            type_id = ros2_type_ids[base]
+        else:
+            name = self.domain.resolve_field_type(ref)
+            description = name and self.description(name)
+            if not description:
+                return None
+            type_id = ros2_nested_type_id
+            nested_type_name = ros2_type_name(name)
+            nested.add(name)
+            nested.update(description[1])
+        if type_id is None:
+            return None
+
+        capacity = m.group('capacity')
+        if m.group('bounded'):
+            type_id += ros2_array_offsets['bounded']
+        elif capacity:
+            type_id += ros2_array_offsets['array']
+        elif suffix.endswith('[]'):
+            type_id += ros2_array_offsets['unbounded']
+        return collections.OrderedDict([
+            ('type_id', type_id),
+            ('capacity', int(capacity or 0)),
+            ('string_capacity', int(string_capacity or 0)),
+            ('nested_type_name', nested_type_name),
+        ])
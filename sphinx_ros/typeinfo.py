@@ -0,0 +1,204 @@
+"""
+``sphinx_ros.typeinfo`` module
+==============================
+
+This module adds fields with information derived from the whole project to
+the descriptions of message types: the messages, services, and actions with
+fields of the type ("Used by"), the hashes listed in
+:confval:`ros_type_hashes`, and the serialized size if
+:confval:`ros_message_sizes` is set. It also generates the table of the sizes
+of all message types. The type dependency graph is built by the ROS domain
+once per build, see :meth:`~sphinx_ros.domain.RosDomain.get_usedby`.
+"""
+
+from docutils import nodes
+from sphinx import addnodes
+from sphinx.transforms import SphinxTransform
+from sphinx.util import logging
+
+logger = logging.getLogger(__name__)
+
+#: value of :confval:`ros_type_hashes` -> (field label, TypeHasher method)
+type_hashes = {
+    'md5sum': ('MD5 sum', 'md5sum'),
+    'rihs01': ('Type hash', 'rihs01'),
+}
+
+
+class typeinfo(nodes.General, nodes.Element):
+    """
+    Placeholder for the fields of a message type description derived from
+    the whole project, with the full name of the type as ``reftarget``.
+    """
+
+
+class sizetable(nodes.General, nodes.Element):
+    """
+    Placeholder for the table of the sizes of all message types.
+    """
+
+
+def format_size(size):
+    """
+    Return the text describing the size of a message type.
+
+    :param size: The size of the message type
+    :type size: sphinx_ros.typesize.MessageSize
+    """
+    if not size.variable:
+        return '{} bytes'.format(size.size)
+    return 'at least {} bytes'.format(size.size)
+
+
+def make_type_xref(fullname, docname):
+    """
+    Return a reference to a documented type, titled e.g. ``foo_pkg/Foo``.
+    """
+    pkgname, _, name = fullname.rpartition('.')
+    title = pkgname.rpartition('.')[0] + '/' + name
+    refnode = addnodes.pending_xref(
+        '', refdomain='ros', reftype='obj', reftarget=fullname,
+        refexplicit=True, refdoc=docname)
+    refnode['ros:package'] = None
+    refnode += nodes.literal(title, title, classes=['xref', 'ros', 'ros-obj'])
+    return refnode
+
+
+def make_literals(texts):
+    """
+    Return a paragraph with the texts as comma-separated literals.
+    """
+    par = nodes.paragraph()
+    for i, text in enumerate(texts):
+        if i:
+            par += nodes.Text(', ')
+        par += nodes.literal(text, text)
+    return par
+
+
+class RosTypeInfoTransform(SphinxTransform):
+    """
+    Replaces the placeholders with the fields of the message types. It runs
+    before the references are resolved.
+    """
+    default_priority = 5
+
+    def apply(self):
+        domain = self.env.get_domain('ros')
+        for node in self.document.traverse(typeinfo):
+            fields = []
+            users = domain.get_usedby(node['reftarget'])
+            if users:
+                fields.append(self.make_field('Used by',
+                                              self.make_usedby(users)))
+            for name in self.config.ros_type_hashes:
+                if name not in type_hashes:
+                    continue
+                label, method = type_hashes[name]
+                value = getattr(domain.get_type_hasher(),
+                                method)(node['reftarget'])
+                if value:
+                    fields.append(self.make_field(label,
+                                                  make_literals([value])))
+            # No size if the definition of the type is not known, e.g. a
+            # message described without doc fields
+            size = None
+            if self.config.ros_message_sizes:
+                size = domain.get_type_sizer().size(node['reftarget'])
+            if size is not None:
+                fields.append(self.make_field('Size', nodes.paragraph(
+                    '', format_size(size))))
+                if size.variable:
+                    fields.append(self.make_field(
+                        'Variable fields', make_literals(size.variable)))
+            if not fields:
+                node.parent.remove(node)
+                continue
+
+            # Add the fields to the doc fields of the description, if any
+            index = node.parent.index(node)
+            if index and isinstance(node.parent[index - 1], nodes.field_list):
+                node.parent[index - 1].extend(fields)
+                node.parent.remove(node)
+            else:
+                node.replace_self(nodes.field_list('', *fields))
+
+    def make_field(self, label, body):
+        return nodes.field('', nodes.field_name('', label),
+                           nodes.field_body('', body))
+
+    def make_usedby(self, users):
+        """
+        Return a paragraph with references to the using types.
+        """
+        par = nodes.paragraph()
+        for i, user in enumerate(users):
+            if i:
+                par += nodes.Text(', ')
+            par += make_type_xref(user, self.env.docname)
+        return par
+
+
+class RosSizeTableTransform(SphinxTransform):
+    """
+    Replaces the placeholders with the table of the sizes of all message
+    types, the biggest first. It runs before the references are resolved.
+    """
+    default_priority = 5
+
+    def apply(self):
+        sizes = None
+        for node in self.document.traverse(sizetable):
+            if sizes is None:
+                domain = self.env.get_domain('ros')
+                sizes = domain.get_type_sizer().all_sizes()
+            node.replace_self(self.make_table(sizes))
+
+    def make_table(self, sizes):
+        table = nodes.table(classes=['ros-sizetable'])
+        tgroup = nodes.tgroup(cols=3)
+        table += tgroup
+        for width in (30, 15, 55):
+            tgroup += nodes.colspec(colwidth=width)
+        thead = nodes.thead()
+        tgroup += thead
+        thead += self.make_row([nodes.paragraph('', 'Message type'),
+                                nodes.paragraph('', 'Size'),
+                                nodes.paragraph('', 'Variable fields')])
+        tbody = nodes.tbody()
+        tgroup += tbody
+        for fullname, size in sizes:
+            tbody += self.make_row([
+                nodes.paragraph('', '', make_type_xref(fullname,
+                                                       self.env.docname)),
+                nodes.paragraph('', format_size(size)),
+                make_literals(size.variable)])
+        return table
+
+    def make_row(self, cells):
+        row = nodes.row()
+        for cell in cells:
+            row += nodes.entry('', cell)
+        return row
+
+
+def check_type_hashes(app, config):
+    """
+    Handler for the ``config-inited`` event, warning about the values of
+    :confval:`ros_type_hashes` that are not known, which are ignored.
+    """
+    for name in config.ros_type_hashes:
+        if name not in type_hashes:
+            logger.warning("unknown ROS type hash '%s' in ros_type_hashes, "
+                           'accepted values are %s', name,
+                           ', '.join("'{}'".format(key)
+                                     for key in sorted(type_hashes)))
+
+
+def note_changed_typeinfo(app, env):
+    """
+    Handler for the ``env-get-updated`` event, returning the documents with
+    message types whose users or nested types changed, so that their fields
+    are written again.
+    """
+    return env.get_domain('ros').get_changed_docs()
@@ -0,0 +1,138 @@
+"""
+``sphinx_ros.typesize`` module
+==============================
+
+This module computes the serialized size of message types in the ROS 1 wire
+format from their documented fields. Strings and arrays without fixed length
+are serialized with a 4 byte length prefix, so messages with such fields
+have a minimum size and a list of variable-length fields. Nested message
+types are expanded recursively and the results are memoized per type.
+"""
+
+import collections
+import re
+
+from six import iteritems
+from .interfaces import split_array_type
+from .stats import count
+from .xref_role import RosXRefRole
+
+#: The serialized size of a message type: the size in bytes of the message,
+#: or its minimum size if it has variable-length fields, and the paths of
+#: these fields, e.g. ``'header.frame_id'``.
+MessageSize = collections.namedtuple('MessageSize', ['size', 'variable'])
+
+#: fixed-size primitive type -> serialized size in bytes
+fixed_sizes = {
+    'bool': 1,
+    'int8': 1,
+    'uint8': 1,
+    'byte': 1,
+    'char': 1,
+    'int16': 2,
+    'uint16': 2,
+    'int32': 4,
+    'uint32': 4,
+    'float32': 4,
+    'int64': 8,
+    'uint64': 8,
+    'float64': 8,
+    'time': 8,
+    'duration': 8,
+}
+
+#: primitive type -> serialized size in bytes, ``None`` for the strings, which
+#: have a length prefix
+primitive_sizes = dict((name, fixed_sizes.get(name))
+                       for name in RosXRefRole.ros_msg_primitives)
+
+#: The size of the length prefix of strings and variable-length arrays.
+length_prefix_size = 4
+
+array_re = re.compile(r'\[(?P<bounded><=)?(?P<length>\d*)\]$')
+
+
+class TypeSizer(object):
+    """
+    The memoized serialized sizes of the message types of a ROS domain.
+    Types that are not documented, whose definition is not known, see
+    :meth:`~sphinx_ros.domain.RosDomain.get_message_definition`, or that have
+    nested types like these have no size.
+
+    :param domain: The ROS domain
+    :type domain: sphinx_ros.domain.RosDomain
+    """
+
+    def __init__(self, domain):
+        self.domain = domain
+        #: fullname -> MessageSize
+        self.sizes = {}
+
+    def size(self, fullname):
+        """
+        Return the serialized size of a message type, or ``None``.
+
+        :param str fullname: The full name of the message type
+        :rtype: MessageSize
+        """
+        if fullname in self.sizes:
+            count(self.domain.env, 'type_size_hits')
+            return self.sizes[fullname]
+        count(self.domain.env, 'type_size_misses')
+        self.sizes[fullname] = None  # guards against recursive definitions
+        definition = self.domain.get_message_definition(fullname)
+        if definition is not None:
+            total = 0
+            variable = []
+            for type_, name, ref in definition[1]:
+                field_size = self._field_size(type_, name, ref)
+                if field_size is None:
+                    break
+                total += field_size.size
+                variable.extend(field_size.variable)
+            else:
+                self.sizes[fullname] = MessageSize(total, tuple(variable))
+        return self.sizes[fullname]
+
+    def _field_size(self, type_, name, ref):
+        base, suffix = split_array_type(type_)
+        m = array_re.search(suffix)
+        if m is None:
+            return self._element_size(base, name, ref)
+        if m.group('bounded') or not m.group('length'):
+            return MessageSize(length_prefix_size, (name,))
+        element = self._element_size(base, name + '[]', ref)
+        if element is None:
+            return None
+        return MessageSize(int(m.group('length')) * element.size,
+                           element.variable)
+
+    def _element_size(self, base, name, ref):
+        if base in primitive_sizes:
+            size = primitive_sizes[base]
+            if size is None:
+                return MessageSize(length_prefix_size, (name,))
+            return MessageSize(size, ())
+        nested = self.domain.resolve_field_type(ref)
+        size = nested and self.size(nested)
+        if not size:
+            return None
+        return MessageSize(size.size, tuple(name + '.' + path
+                                            for path in size.variable))
+
+    def all_sizes(self):
+        """
+        Return the full names and sizes of all documented message types with
+        a known size, the biggest first. Types whose definition is not known,
+        e.g. messages described without doc fields, are skipped.
+
+        :rtype: list
+        """
+        sizes = []
+        for fullname, (_, objtype) in iteritems(self.domain.data['objects']):
+            if objtype == 'message':
+                size = self.size(fullname)
+                if size is not None:
+                    sizes.append((fullname, size))
+        sizes.sort(key=lambda x: (-x[1].size, x[0]))
+        return sizes
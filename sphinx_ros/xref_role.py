@@ -7,6 +7,7 @@
 import re
 
 from docutils import nodes
+from sphinx import addnodes
 from sphinx.roles import XRefRole
 
 
@@ -14,12 +15,23 @@ class RosXRefRole(XRefRole):
 
     ros_msg_primitives = ['bool', 'int8', 'uint8', 'int16', 'uint16', 'int32',
                           'uint32', 'int64', 'uint64', 'float32', 'float64',
-                          'string', 'time', 'duration']
+                          'string', 'time', 'duration', 'byte', 'char',
+                          'wstring']
 
     ros_api_pkgs = ['std_msgs', 'geometry_msgs', 'sensor_msgs']
 
+    #: role -> interface kind
+    ros_role_kinds = {'msg': 'msg', 'srv': 'srv', 'act': 'action'}
+
+    #: roles of the computation graph, whose targets are graph names
+    ros_graph_roles = ('node', 'topic', 'param', 'service_server')
+
     def process_link(self, env, refnode, has_explicit_title, title, target):
         refnode['ros:package'] = env.ref_context.get('ros:package')
+        refnode['ros:node'] = env.ref_context.get('ros:node')
+        if refnode['reftype'] in self.ros_graph_roles:
+            # a tilde starts a private name, see resolve_graph_name()
+            return title, target
         if not has_explicit_title:
             title = title.lstrip('.')    # only has a meaning for the target
             target = target.lstrip('~')  # only has a meaning for the title
@@ -36,19 +48,24 @@ class RosXRefRole(XRefRole):
         return title, target
 
     def result_nodes(self, document, env, node, is_ref):
-        if node['reftype'] in ['msg', 'srv', 'action']:
-            obj_type = node['reftype']
+        if node['reftype'] in self.ros_role_kinds:
+            obj_type = self.ros_role_kinds[node['reftype']]
             title = node.astext()
             target = node['reftarget']
             if target.endswith('[]'):
                 target = target[:-2]
+            # Without type inventories or installed types, fall back to
+            # linking the API documentation of the default ROS message
+            # packages.
+            legacy = not env.config.ros_type_inventories and \
+                not env.config.ros_system_interfaces
 
             # If reference to a ros message, service, or action
             if target in self.ros_msg_primitives:
                 # If the target is a ROS message primitive then don't add a
                 # link.
                 node = nodes.literal(title, title)
-            elif target == "Header":
+            elif target == "Header" and legacy:
                 # If the target is the message primitive "Header", then refer
                 # to that documentation.
                 target = 'http://docs.ros.org/' + \
@@ -60,12 +77,18 @@ class RosXRefRole(XRefRole):
                 text_node['classes'] = ['xref', 'ros', 'ros-' + obj_type]
                 ref_node += text_node
                 node = ref_node
-            elif '/' in target:
+            elif target == "Header":
+                node['reftarget'] = 'std_msgs.msg.Header'
+            elif target.count('/') in (1, 2):
                 # If the target contains a forward slash, it is either a
                 # reference to a standard ROS message type or a custom message
-                # type.
-                pkg, obj = target.split('/')
-                if pkg in self.ros_api_pkgs:
+                # type, e.g. 'std_msgs/String' or 'std_msgs/msg/String' as in
+                # ROS 2.
+                parts = target.split('/')
+                pkg, obj = parts[0], parts[-1]
+                if len(parts) == 3:
+                    obj_type = parts[1]
+                if legacy and pkg in self.ros_api_pkgs:
                     # In the former case we link to the API documentation of
                     # ROS.
                     target = 'http://docs.ros.org/' + \
@@ -79,7 +102,15 @@ class RosXRefRole(XRefRole):
                     node = ref_node
                 else:
                     # In the latter case we change the link to the unique
-                    # 'fullname' of the described object.
-                    node['reftarget'] = '.'.join([pkg, node['reftype'], obj])
+                    # 'fullname' of the described object. Types documented
+                    # elsewhere are resolved with the type inventories.
+                    node['reftarget'] = '.'.join([pkg, obj_type, obj])
+
+            if isinstance(node, addnodes.pending_xref):
+                # Read the document again when the type changes, see
+                # RosDomain.get_referencing_docs()
+                env.get_domain('ros').note_type_ref(env.docname, (
+                    node.get('ros:package'), node['reftarget'],
+                    node['reftype'], node.hasattr('refspecific') and 1 or 0))
 
         return [node], []